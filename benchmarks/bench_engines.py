@@ -0,0 +1,118 @@
+"""
+Throughput benchmark of the DataFrame engines (`utils.engine`).
+
+Builds synthetic datasets shaped like the app's data (entities x years, with
+country and aggregate rows, ISO codes and a region -> map shapes mapping),
+scaled to the requested row counts, and times every query of the engine
+interface with each engine. As in the app, the inputs are converted to each
+engine's native format once, before timing (the pipeline caches them per
+dataset version, see `utils.datasets.load_query_table`), and the outputs are
+pandas DataFrames, so the Polars figures include the conversion of the result.
+
+Run from the repository root:
+
+    python benchmarks/bench_engines.py [--rows 100000 1000000 5000000] [--repeat 5]
+
+Reports the median time per query and the throughput in input rows per second.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from utils.engine import DATAFRAME_ENGINES, get_engine  # noqa: E402
+
+YEARS = np.arange(1990, 2025)
+AGGREGATE_SHARE = 0.05  # Fraction of entities that are regions (not countries)
+
+
+def synthetic_data(n_rows, seed=0):
+    """
+    Long (Entity, Year, iso_a3, value) table with about `n_rows` rows.
+
+    Returns:
+        tuple: (df, country_mask, shapes) where `shapes` maps every entity to
+               the map shapes it covers (1 for countries, 40 for regions).
+    """
+    rng = np.random.default_rng(seed)
+    n_entities = max(2, n_rows // len(YEARS))
+    entities = np.array([f'E{i:07d}' for i in range(n_entities)])
+    is_country = rng.random(n_entities) >= AGGREGATE_SHARE
+    # Several entities share a code now and then, as historical names do
+    iso = np.where(is_country, np.char.add('C', (np.arange(n_entities) % (n_entities // 2 + 1)).astype(str)), None)
+
+    df = pd.DataFrame({
+        'Entity': np.repeat(entities, len(YEARS)),
+        'Year': np.tile(YEARS, n_entities),
+        'iso_a3': np.repeat(iso, len(YEARS)),
+        'Value': rng.lognormal(3, 2, n_entities * len(YEARS)),
+    })
+    entities[0] = 'World'
+    df.loc[df['Entity'] == df['Entity'].iloc[0], 'Entity'] = 'World'
+    mask = np.repeat(is_country, len(YEARS))
+    shapes = {e: ((e,) if c else tuple(f'{e}-{k}' for k in range(40))) for e, c in zip(entities, is_country)}
+    return df, mask, shapes
+
+
+def queries(df, mask, shapes):
+    """Query name -> (callable taking an engine and its native inputs, number of input rows)."""
+    half = len(df) // 2
+    frames = {'A': df.iloc[:half], 'B': df.iloc[half:].assign(Entity='World')}
+    last_year = df[df['Year'] == YEARS[-1]]
+    return {
+        'country_year_totals': (lambda e, n: e.country_year_totals(n['df'], mask, 'Value'), len(df)),
+        'entity_summary': (lambda e, n: e.entity_summary(n['df'], 'Value'), len(df)),
+        'compare_entity': (lambda e, n: e.compare_entity(n['frames'], 'World', 'Value', 'Series', 'Value'), len(df)),
+        'expand_to_shapes': (lambda e, n: e.expand_to_shapes(n['last_year'], shapes, 'Value'), len(last_year)),
+    }, {'df': df, 'frames': frames, 'last_year': last_year}
+
+
+def native_inputs(engine, inputs):
+    """The query inputs converted once to the engine's native format, as the pipeline caches them."""
+    return {
+        key: {k: engine.native(v) for k, v in value.items()} if isinstance(value, dict) else engine.native(value)
+        for key, value in inputs.items()
+    }
+
+
+def timed(fn, repeat):
+    """Median wall time of `repeat` calls (after one warm-up call)."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--engines', nargs='+', choices=DATAFRAME_ENGINES, default=list(DATAFRAME_ENGINES))
+    args = parser.parse_args()
+
+    engines = [get_engine(name) for name in args.engines]
+    print(f"{'rows':>10} {'query':<20} " + ' '.join(f"{e.name + ' ms':>12} {e.name + ' rows/s':>16}" for e in engines))
+    for n_rows in args.rows:
+        df, mask, shapes = synthetic_data(n_rows)
+        named_queries, inputs = queries(df, mask, shapes)
+        natives = {engine.name: native_inputs(engine, inputs) for engine in engines}
+        for name, (query, n_input) in named_queries.items():
+            cells = []
+            for engine in engines:
+                seconds = timed(lambda: query(engine, natives[engine.name]), args.repeat)
+                cells.append(f"{seconds * 1000:>12.1f} {n_input / seconds:>16,.0f}")
+            print(f"{len(df):>10} {name:<20} " + ' '.join(cells), flush=True)
+
+
+if __name__ == '__main__':
+    main()
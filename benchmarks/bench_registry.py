@@ -0,0 +1,109 @@
+"""
+Marginal cost of one more registered dataset (`utils.registry`).
+
+Copies the registered datasets into a temporary data folder, adds N synthetic
+ones (clones of the publications and private investment exports under new
+registry names) and runs every dataset through the shared pipeline of
+`utils.datasets` in order: ingest, ISO resolve, one field slice, map rows and
+choropleth classes. For each dataset it reports the cold time and the memory
+its results retain (tracemalloc), so the cost of dataset N+1 can be read off
+the synthetic rows. Run from the repository root:
+
+    python benchmarks/bench_registry.py [--extra 6]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+os.chdir(ROOT)
+
+from utils.config import DATA_PATH, WORLD_MAP  # noqa: E402
+from utils.datasets import build_cube, choropleth_bins, map_rows, slice_field, value_columns  # noqa: E402
+from utils.regions import EntityHierarchy, read_entity_codes, read_geo_countries  # noqa: E402
+from utils.registry import discover_datasets, registry  # noqa: E402
+
+
+def make_data_dir(extra):
+    """Temporary data folder with the registered datasets plus `extra` clones."""
+    tmp = tempfile.mkdtemp(prefix='vd-registry-')
+    shutil.copytree(os.path.join(DATA_PATH, os.path.dirname(WORLD_MAP)), os.path.join(tmp, os.path.dirname(WORLD_MAP)))
+    templates = []
+    for spec in registry().values():
+        folder = os.path.dirname(spec.csv)
+        shutil.copytree(os.path.join(DATA_PATH, folder), os.path.join(tmp, folder))
+        if spec.map_join is not None:
+            templates.append(spec)
+
+    for k in range(extra):
+        spec = templates[k % len(templates)]
+        slug = f'zz-synthetic-{k:02d}'
+        os.makedirs(os.path.join(tmp, slug))
+        shutil.copy(spec.path, os.path.join(tmp, slug, f'{slug}.csv'))
+        with open(spec.path[:-len('.csv')] + '.metadata.json', encoding='utf-8') as f:
+            metadata = json.load(f)
+        metadata['dashboard'].update(name=f'synthetic-{k:02d}', label=f'Sintético {k:02d}')
+        with open(os.path.join(tmp, slug, f'{slug}.metadata.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+    return tmp
+
+
+def run_pipeline(spec, hierarchy):
+    """Every stage of the shared pipeline for one dataset; returns what the app would cache."""
+    cube = build_cube(spec)
+    fields = value_columns(spec)[1]
+    table = slice_field(spec, cube, fields[0] if fields else None)
+    results = {'cube': cube, 'table': table}
+    if spec.map_join is not None:
+        rows = map_rows(spec, table, hierarchy)
+        results['rows'] = rows
+        results['slices'] = {year: group for year, group in rows.groupby('Year')}
+        results['bins'] = choropleth_bins(spec, rows, hierarchy)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--extra', type=int, default=6, help='Synthetic datasets added after the registered ones')
+    args = parser.parse_args()
+
+    tmp = make_data_dir(args.extra)
+    try:
+        datasets = discover_datasets(tmp)
+        hierarchy = EntityHierarchy(
+            read_entity_codes(spec.path for spec in datasets.values()),
+            read_geo_countries(os.path.join(tmp, WORLD_MAP))
+        )
+
+        tracemalloc.start()
+        kept = []
+        rows = []
+        for name, spec in datasets.items():
+            before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            results = run_pipeline(spec, hierarchy)
+            elapsed = time.perf_counter() - start
+            kept.append(results)  # Held like the app's caches hold them
+            retained = tracemalloc.get_traced_memory()[0] - before
+            rows.append((name, len(results['cube']), elapsed * 1000, retained / 1024))
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"\n{'dataset':<22} {'cube rows':>10} {'cold ms':>9} {'retained KiB':>13}")
+    for name, n_rows, ms, kib in rows:
+        print(f"{name:<22} {n_rows:>10} {ms:>9.1f} {kib:>13.1f}")
+    synthetic = [r for r in rows if r[0].startswith('synthetic-')]
+    if synthetic:
+        print(f"\nmarginal cost per extra dataset: {sum(r[2] for r in synthetic) / len(synthetic):.1f} ms, "
+              f"{sum(r[3] for r in synthetic) / len(synthetic):.1f} KiB retained")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Memory benchmark for multi-worker deployments.
+
+Starts 1, 4 and 8 worker processes that load every dataset the way an app
+process does, once with private per-process caches and once with the shared
+memory-mapped artifacts (VD_SHARED_ARTIFACTS=1), and reports the total RSS
+and PSS (proportional set size: shared pages are split between the processes
+mapping them) of each group. A bare worker that only imports the app modules
+is measured too, so the data cost per worker can be read off directly.
+
+Each worker calls every loader the pages use `--reruns` times (the table
+loaders, the map year slices and choropleth classes, the world GeoJSON and the
+entity hierarchy), as successive Streamlit reruns do, and keeps the results of
+the last call alive like a session rendering them, so the memory figures
+include what the app actually holds. The mean time of one round of loader calls is reported as well.
+
+Linux only (reads /proc/<pid>/smaps_rollup). Run from the repository root:
+
+    python benchmarks/bench_workers.py [--workers 1 4 8] [--scale 20] [--reruns 20]
+
+`--scale N` replicates the publications table N times (shifting the years) in
+a temporary data directory, to see how the two modes grow with data size.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+sys.path.insert(0, SRC)
+
+from utils.config import DATA_PATH, CSV_PUB  # noqa: E402
+
+MODES = ('bare', 'private', 'shared')
+
+
+def worker(mode, reruns):
+    """Body of one worker process: load everything `reruns` times, report ready, wait."""
+    import logging
+    logging.disable(logging.WARNING)
+    from functools import partial
+    from utils import data
+    from utils.datasets import load_year_slices
+    from utils.regions import load_hierarchy
+
+    held = []
+    rerun_ms = 0.0
+    if mode != 'bare':
+        loaders = (data.load_annual_papers_data, data.load_global_investment_data,
+                   data.load_private_ai_investment_data, data.load_annual_papers_map_data,
+                   data.load_annual_investment_map_data,
+                   partial(load_year_slices, 'papers', data.DEFAULT_FIELD),
+                   partial(load_year_slices, 'private-investment'),
+                   data.load_papers_choropleth_bins, data.load_investment_choropleth_bins,
+                   data.world_geojson, load_hierarchy)
+        for loader in loaders:
+            loader()  # Cold call: fills st.cache_data (private) or maps the artifacts (shared)
+        start = time.perf_counter()
+        for _ in range(reruns):
+            held = [loader() for loader in loaders]  # The frames a session holds while rendering
+        rerun_ms = (time.perf_counter() - start) * 1000 / max(reruns, 1)
+    import gc
+    gc.collect()
+    print(f'ready {rerun_ms:.2f}', flush=True)
+    sys.stdin.read()  # Block until the parent closes stdin
+    del held
+
+
+def memory_kb(pid):
+    """Returns (rss_kb, pss_kb) of a process."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def run_group(mode, n_workers, data_root, reruns):
+    """
+    Starts `n_workers` workers in `mode`.
+
+    Returns:
+        tuple: Summed (rss, pss) in MB and the mean time of one round of loader calls in ms.
+    """
+    env = dict(os.environ, PYTHONPATH=SRC, VD_SHARED_ARTIFACTS='1' if mode == 'shared' else '0')
+    procs = [
+        subprocess.Popen([sys.executable, __file__, '--worker', mode, '--reruns', str(reruns)],
+                         cwd=data_root, env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(n_workers)
+    ]
+    rerun_ms = []
+    try:
+        for proc in procs:
+            # Loaders may print warnings to stdout before the worker is ready
+            ready = next((line.split() for line in proc.stdout if line.startswith('ready')), None)
+            if ready is None:
+                raise RuntimeError(f"Worker {proc.pid} failed to start in mode '{mode}'")
+            rerun_ms.append(float(ready[1]))
+        totals = [memory_kb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    rss = sum(t[0] for t in totals) / 1024
+    pss = sum(t[1] for t in totals) / 1024
+    return rss, pss, sum(rerun_ms) / len(rerun_ms)
+
+
+def prepare_data(scale):
+    """Copies the data directory to a temporary root, replicating the publications `scale` times."""
+    root = tempfile.mkdtemp(prefix='vd-bench-')
+    shutil.copytree(os.path.join(ROOT, DATA_PATH), os.path.join(root, DATA_PATH))
+    if scale > 1:
+        path = os.path.join(root, DATA_PATH, CSV_PUB)
+        df = pd.read_csv(path)
+        span = df['Year'].max() - df['Year'].min() + 1
+        df = pd.concat([df.assign(Year=df['Year'] - i * span) for i in range(scale)], ignore_index=True)
+        df.to_csv(path, index=False)
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--reruns', type=int, default=20, help='Loader calls per worker after the cold one')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker, args.reruns)
+        return
+
+    data_root = prepare_data(args.scale)
+    try:
+        # Build the artifacts once, as a deployment would before starting the workers
+        env = dict(os.environ, PYTHONPATH=SRC, VD_SHARED_ARTIFACTS='1')
+        subprocess.run([sys.executable, '-m', 'utils.artifacts'], cwd=data_root, env=env,
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        print(f"scale={args.scale} reruns={args.reruns}")
+        print(f"{'mode':<8} {'workers':>7} {'RSS total MB':>13} {'PSS total MB':>13} {'PSS/worker MB':>14} "
+              f"{'rerun ms':>9}")
+        for n_workers in args.workers:
+            for mode in MODES:
+                rss, pss, rerun_ms = run_group(mode, n_workers, data_root, args.reruns)
+                print(f"{mode:<8} {n_workers:>7} {rss:>13.1f} {pss:>13.1f} {pss / n_workers:>14.1f} "
+                      f"{rerun_ms:>9.2f}")
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Soak test for long-lived map sessions.
+
+Drives one simulated session (Streamlit's AppTest) through a long series of
+year-slider moves on each map view, as a user browsing the maps for a long
+time would, and samples the process RSS and the size of the session state
+(number of entries and pickled bytes) along the way.
+
+After a warm-up (caches filled, every year visited once), growth must stay
+under the budgets; the script exits with status 1 otherwise, so it can run in
+CI. Linux only (reads /proc/self/status). Run from the repository root:
+
+    python benchmarks/soak_sessions.py [--steps 300] [--rss-budget 40] [--state-budget 64]
+
+Budgets: --rss-budget in MB of RSS growth, --state-budget in KB of session
+state growth, both measured from the end of the warm-up to the end of the run.
+"""
+import argparse
+import os
+import pickle
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+os.chdir(ROOT)
+os.environ.setdefault('DATA_API_PORT', '0')  # The API server is not part of the session
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+st.page_link = lambda *args, **kwargs: None  # Multipage links need the full app runtime
+
+MAP_PAGE = 'src/pages/maps.py'
+SAMPLE_EVERY = 25
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def session_state_size(at):
+    """Returns (entries, pickled KB) of the session state of an AppTest."""
+    state = at.session_state._state
+    entries = state.filtered_state
+    size = 0
+    for value in entries.values():
+        try:
+            size += len(pickle.dumps(value))
+        except Exception:
+            size += sys.getsizeof(value)
+    return len(state._keys()), size / 1024
+
+
+def soak(view, steps):
+    """
+    Moves the year slider of one map view `steps` times.
+
+    Returns:
+        list: (step, rss MB, state entries, state KB) samples.
+    """
+    at = AppTest.from_file(MAP_PAGE, default_timeout=300).run()
+    at.selectbox[0].select(view).run()
+    slider = at.slider[0]
+    years = list(range(int(slider.min), int(slider.max) + 1))
+    samples = []
+    for step in range(steps):
+        at.slider[0].set_value(years[step % len(years)]).run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        if step % SAMPLE_EVERY == 0 or step == steps - 1:
+            samples.append((step, rss_mb(), *session_state_size(at)))
+    return samples, len(years)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--rss-budget', type=float, default=40, help='MB of RSS growth after warm-up')
+    parser.add_argument('--state-budget', type=float, default=64, help='KB of session state growth after warm-up')
+    parser.add_argument('--views', nargs='+', default=['Publicaciones Anuales', 'Inversión Privada en IA'])
+    args = parser.parse_args()
+
+    failed = False
+    for view in args.views:
+        samples, n_years = soak(view, args.steps)
+        print(f"\n{view} ({n_years} years, {args.steps} slider moves)")
+        print(f"{'step':>6} {'RSS MB':>9} {'entries':>8} {'state KB':>9}")
+        for step, rss, entries, state_kb in samples:
+            print(f"{step:>6} {rss:>9.1f} {entries:>8} {state_kb:>9.1f}")
+
+        # Baseline: first sample after every year was visited once
+        warm = next((s for s in samples if s[0] >= n_years), samples[0])
+        end = samples[-1]
+        rss_growth, state_growth = end[1] - warm[1], end[3] - warm[3]
+        ok = rss_growth <= args.rss_budget and state_growth <= args.state_budget
+        failed |= not ok
+        print(f"growth after warm-up: RSS {rss_growth:+.1f} MB (budget {args.rss_budget}), "
+              f"state {state_growth:+.1f} KB, {end[2] - warm[2]:+d} entries (budget {args.state_budget} KB) "
+              f"-> {'OK' if ok else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
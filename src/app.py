@@ -3,32 +3,33 @@ Main application file for the Streamlit AI Dashboard.
 
 This page serves as the home page, displaying a header image and the content
 from the project's README.md file. It also initializes the common sidebar.
+The header is served as resized WebP variants and the README from memory
+(see `utils.assets`).
 """
 import streamlit as st
 
+from utils.assets import header_image, markdown_document
+from utils.reruns import page_run
 from utils.sidebar import sidebar
 
 # Configure the page
 st.set_page_config(page_title='Home', layout='wide') # Added layout='wide' for consistency
+with page_run('Home'):
+    try:
+        header_image('main_header.png', alt='Visualización de datos sobre IA')
+    except (FileNotFoundError, KeyError):
+        st.error("Header image (src/img/main_header.png) not found. Ensure the path is correct relative to the app's root directory when running Streamlit.")
 
 
-try:
-    st.image('src/img/main_header.png')
-except FileNotFoundError:
-    st.error("Header image (src/img/main_header.png) not found. Ensure the path is correct relative to the app's root directory when running Streamlit.")
+    # Load and display content from README.md
+    try:
+        st.markdown(markdown_document('README.md'))
+    except FileNotFoundError:
+        st.error("README.md not found. Please ensure it is in the parent directory of 'src'.")
+    except Exception as e:
+        st.error(f"Error reading README.md: {e}")
 
 
-# Load and display content from README.md
-try:
-    with open('README.md', 'r', encoding='utf-8') as f: # Added encoding
-        readme_content = f.read()
-    st.markdown(readme_content)
-except FileNotFoundError:
-    st.error("README.md not found. Please ensure it is in the parent directory of 'src'.")
-except Exception as e:
-    st.error(f"Error reading README.md: {e}")
-
-
-# Initialize the sidebar
-with st.sidebar:
-    sidebar()
+    # Initialize the sidebar
+    with st.sidebar:
+        sidebar()
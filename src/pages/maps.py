@@ -1,29 +1,59 @@
 import streamlit as st
 from streamlit_folium import st_folium
 
-from utils.constants import options_dict_views
-from utils.data import annual_papers_map_folium, annual_investment_map_folium
+from utils.constants import options_dict_views, options_dict_binning, options_dict_static_formats
+from utils.data import annual_papers_map_folium, annual_investment_map_folium, field_selector
+from utils.datasets import generic_datasets
+from utils.reruns import page_run
+from utils.static_maps import static_map
 from utils.sidebar import sidebar
 
 st.set_page_config(page_title='Mapas y Vistas',
                    layout='wide')
 st.title('🌍 Mapas y Vistas')
+with page_run('Mapas y Vistas'):
+    with st.sidebar:
+        sidebar()
 
-with st.sidebar:
-    sidebar()
+    # Conjuntos de datos registrados con mapa pero sin vista propia (siempre en modo estático)
+    generic_views = {spec.label: spec.name for spec in generic_datasets(with_map=True)}
 
-options = st.selectbox(
-    'Elige el gráfico que deseas visualizar',
-    options=options_dict_views,
-    label_visibility='collapsed',
-    index=None,
-    placeholder='Selecciona un mapa a visualizar...'
-)
+    options = st.selectbox(
+        'Elige el gráfico que deseas visualizar',
+        options=[*options_dict_views, *generic_views],
+        label_visibility='collapsed',
+        index=None,
+        placeholder='Selecciona un mapa a visualizar...'
+    )
 
-selected_idx = options_dict_views.get(options, None)
+    selected_idx = options_dict_views.get(options, None)
 
-match selected_idx:
-    case 0:
-        annual_papers_map_folium()
-    case 1:
-        annual_investment_map_folium()
\ No newline at end of file
+    binning_label = st.radio(
+        'Clasificación de colores',
+        options=options_dict_binning,
+        horizontal=True
+    )
+    binning_method = options_dict_binning[binning_label]
+
+    # Modo estático para conexiones lentas: se elige por sesión, o con ?render=static en la URL
+    if 'static_maps' not in st.session_state:
+        st.session_state['static_maps'] = st.query_params.get('render') == 'static'
+    static_mode = st.toggle('Modo estático (imagen, bajo ancho de banda)', key='static_maps')
+    if static_mode:
+        format_label = st.radio('Formato', options=options_dict_static_formats, horizontal=True)
+        static_format = options_dict_static_formats[format_label]
+
+    if selected_idx == 0:
+        field = field_selector()
+
+    match selected_idx:
+        case 0 if static_mode:
+            static_map('papers', binning_method, static_format, field=field)
+        case 1 if static_mode:
+            static_map('investment', binning_method, static_format)
+        case 0:
+            annual_papers_map_folium(binning_method, field)
+        case 1:
+            annual_investment_map_folium(binning_method)
+        case None if options in generic_views:
+            static_map(generic_views[options], binning_method, static_format if static_mode else 'png')
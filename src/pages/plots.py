@@ -1,28 +1,42 @@
 import streamlit as st
 
 from utils.constants import options_dict
+from utils.reruns import page_run
 from utils.sidebar import sidebar
-from utils.data import annual_papers, global_investment
+from utils.data import annual_papers, global_investment, dataset_chart
+from utils.datasets import generic_datasets
+from utils.analytics import trend_rankings
+from utils.comparison import entity_comparison
 
 st.set_page_config(page_title='Plots',
                    layout='wide')
 st.title('📊 Plots')
+with page_run('Plots'):
+    with st.sidebar:
+        sidebar()
 
-with st.sidebar:
-    sidebar()
+    # Conjuntos de datos registrados sin vista propia (vista genérica)
+    generic_views = {spec.label: spec.name for spec in generic_datasets()}
 
-options = st.selectbox(
-    'Elige el gráfico que deseas visualizar',
-    options=options_dict,
-    label_visibility='collapsed',
-    index=None,
-    placeholder='Selecciona un gráfico a visualizar...'
-)
+    options = st.selectbox(
+        'Elige el gráfico que deseas visualizar',
+        options=[*options_dict, *generic_views],
+        label_visibility='collapsed',
+        index=None,
+        placeholder='Selecciona un gráfico a visualizar...'
+    )
 
-selected_idx = options_dict.get(options, None)
+    selected_idx = options_dict.get(options, None)
+
+    match selected_idx:
+        case 0:
+            global_investment()
+        case 1:
+            annual_papers()
+        case 2:
+            trend_rankings()
+        case 3:
+            entity_comparison()
+        case None if options in generic_views:
+            dataset_chart(generic_views[options])
 
-match selected_idx:
-    case 0:
-        global_investment()
-    case 1:
-        annual_papers()
@@ -1,41 +1,97 @@
-import os
 import streamlit as st
 from streamlit_timeline import timeline
 
 
+from utils.reruns import page_run, partial, unit
 from utils.sidebar import sidebar
-from utils.config import DATA_PATH, TIMELINE_DATA
+from utils.timeline import TIMELINE_PATH, load_timeline_store, timeline_json, search_timeline
 
 
 st.set_page_config(page_title='Timeline',
                    layout='wide')
 st.title('📅 Timeline')
+with page_run('Timeline'):
+    with st.sidebar:
+        sidebar()
 
-with st.sidebar:
-    sidebar()
-
-# Load timeline data from JSON file
-data_path = os.path.join(DATA_PATH, TIMELINE_DATA)
-try:
-    with open(data_path, 'r', encoding='utf-8') as f: # Added encoding
-        data = f.read()
-except FileNotFoundError:
-    st.error(f"Error: Timeline data file not found at {data_path}")
-    data = None
-except Exception as e:
-    st.error(f"Error loading timeline data: {e}")
-    data = None
-
-# Add a slider to control the timeline height
-timeline_height = st.slider(
-    "Ajustar Altura de la Línea de Tiempo (px)",
-    min_value=400,
-    max_value=1500,
-    value=800, # New default height
-    step=50
-)
-
-if data:
-    timeline(data, height=timeline_height)
-else:
-    st.warning("No timeline data to display.")
\ No newline at end of file
+    # Load the indexed timeline (parsed once per version of the JSON file)
+    with unit('Carga del timeline'):
+        try:
+            store = load_timeline_store()
+        except FileNotFoundError:
+            st.error(f"Error: Timeline data file not found at {TIMELINE_PATH}")
+            store = None
+        except Exception as e:
+            st.error(f"Error loading timeline data: {e}")
+            store = None
+
+
+    @partial('Línea de tiempo')
+    def timeline_chart(data):
+        """Renders the timeline; the height slider only reruns this fragment."""
+        timeline_height = st.slider(
+            "Ajustar Altura de la Línea de Tiempo (px)",
+            min_value=400,
+            max_value=1500,
+            value=800, # New default height
+            step=50
+        )
+        timeline(data, height=timeline_height)
+
+
+    @partial('Filtros del timeline')
+    def timeline_view(store):
+        """Filters and search of the timeline; changing them reruns only this fragment."""
+        col1, col2 = st.columns(2)
+        with col1:
+            era_labels = store.era_labels()
+            era_label = st.selectbox(
+                'Era',
+                options=era_labels,
+                index=None,
+                placeholder='Todas las eras'
+            )
+            era = era_labels.index(era_label) if era_label is not None else None
+        with col2:
+            first_year, last_year = store.years[0], store.years[-1]
+            if first_year < last_year:
+                year_from, year_to = st.slider(
+                    'Rango de años',
+                    min_value=first_year,
+                    max_value=last_year,
+                    value=(first_year, last_year)
+                )
+            else:
+                year_from, year_to = first_year, last_year
+        lazy = st.toggle('Cargar vídeos bajo demanda (miniaturas)', value=True)
+
+        # Búsqueda de texto completo; elegir un resultado salta a su año
+        query = st.text_input('Buscar eventos', placeholder='p. ej. backpropagation, transformer...')
+        if query.strip():
+            results = search_timeline(store, query)
+            if results:
+                labels = [f"{e['start_date']['year']} · {e['text']['headline']}" for e in results]
+                selected = st.selectbox(
+                    f'{len(results)} resultados',
+                    options=range(len(results)),
+                    format_func=labels.__getitem__,
+                    index=None,
+                    placeholder='Selecciona un resultado para ir a él...'
+                )
+                if selected is not None:
+                    year_from = year_to = results[selected]['start_date']['year']
+                    era = None
+            else:
+                st.info(f"No se encontraron eventos para «{query}».")
+
+        data = timeline_json(store.fingerprint, year_from, year_to, era, lazy)
+        if data is None:
+            st.info("No hay eventos para los filtros seleccionados.")
+            return
+        timeline_chart(data)
+
+
+    if store is not None and store.events:
+        timeline_view(store)
+    else:
+        st.warning("No timeline data to display.")
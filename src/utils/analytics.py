@@ -0,0 +1,244 @@
+"""
+Batched trend analytics.
+
+Every statistic is computed for all entities at once on an (entity x year)
+NumPy matrix: year-over-year growth, rolling CAGR, share of world, rank per
+year and linear / log-linear projections. Results are cached per dataset
+version (fingerprint of the source files) and feed the rankings view.
+"""
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from utils.config import DATA_PATH, CSV_PUB, CSV_INV, CSV_PRINV
+from utils.data import (
+    load_annual_papers_data, load_global_investment_data, load_private_ai_investment_data
+)
+from utils.datasets import generic_datasets, load_table
+from utils.export import export_data
+from utils.fingerprint import file_fingerprint
+from utils.regions import load_hierarchy
+from utils.reruns import partial
+
+CAGR_WINDOW = 3
+PROJECTION_HORIZON = 3
+
+# Dataset name -> (label, loader, value column, source files)
+TREND_DATASETS = {
+    'papers': ('Publicaciones Anuales', load_annual_papers_data, 'Number of articles', [CSV_PUB]),
+    'private-investment': ('Inversión Privada en IA', load_private_ai_investment_data, 'Investment', [CSV_PRINV]),
+    'global-investment': ('Inversión Global en IA Generativa', load_global_investment_data, 'Investment', [CSV_INV]),
+}
+# Other registered datasets, through the shared pipeline
+TREND_DATASETS.update({
+    spec.name: (spec.label, functools.partial(load_table, spec.name), spec.value_name, [spec.csv])
+    for spec in generic_datasets()
+})
+
+
+def entity_year_matrix(df, value_col):
+    """
+    Pivots a long (Entity, Year, value) table into a dense matrix.
+
+    Years are made contiguous, so column offsets are year differences.
+
+    Returns:
+        tuple: (entities ndarray, years ndarray, values ndarray of shape
+               (n_entities, n_years) with NaN for missing observations).
+    """
+    wide = df.pivot_table(index='Entity', columns='Year', values=value_col, aggfunc='sum')
+    years = np.arange(wide.columns.min(), wide.columns.max() + 1)
+    wide = wide.reindex(columns=years)
+    return wide.index.to_numpy(), years, wide.to_numpy(dtype=float)
+
+
+def growth(values, lag=1):
+    """Relative change over `lag` years, for every entity and year (NaN where undefined)."""
+    out = np.full_like(values, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[:, lag:] = values[:, lag:] / values[:, :-lag] - 1
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def rolling_cagr(values, window=CAGR_WINDOW):
+    """Compound annual growth rate over the trailing `window` years."""
+    out = np.full_like(values, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = values[:, window:] / values[:, :-window]
+        out[:, window:] = np.where(ratio > 0, np.power(ratio, 1 / window) - 1, np.nan)
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def ranks(values, eligible):
+    """
+    Rank (1 = largest) of each entity per year among `eligible` rows.
+
+    Missing values and non-eligible rows (aggregates) get NaN.
+    """
+    masked = np.where(eligible[:, None] & ~np.isnan(values), values, -np.inf)
+    order = np.argsort(-masked, axis=0, kind='stable')
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(1, len(values) + 1)[:, None], axis=0)
+    return np.where(np.isfinite(masked), rank, np.nan)
+
+
+def fit_trends(years, values, log=False):
+    """
+    Least-squares line per entity over its observed years, in closed form.
+
+    Args:
+        years (ndarray): Year of each column.
+        values (ndarray): (n_entities, n_years) matrix.
+        log (bool): Fit log(value) instead (log-linear, i.e. constant growth);
+                    non-positive values are ignored.
+
+    Returns:
+        tuple: (slope, intercept) arrays; NaN for entities with < 2 points.
+    """
+    y = np.log(np.where(values > 0, values, np.nan)) if log else values
+    mask = ~np.isnan(y)
+    x = np.broadcast_to(years.astype(float), y.shape)
+    n = mask.sum(axis=1)
+    sx = np.where(mask, x, 0).sum(axis=1)
+    sy = np.where(mask, y, 0).sum(axis=1)
+    sxx = np.where(mask, x * x, 0).sum(axis=1)
+    sxy = np.where(mask, x * np.nan_to_num(y), 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = n * sxx - sx * sx
+        slope = np.where((n >= 2) & (denom != 0), (n * sxy - sx * sy) / denom, np.nan)
+        intercept = (sy - slope * sx) / n
+    return slope, intercept
+
+
+def compute_trends(entities, years, values, world=None, aggregates=()):
+    """
+    Computes every trend statistic for all entities at once.
+
+    Args:
+        entities (ndarray): Entity names (matrix rows).
+        years (ndarray): Years (matrix columns).
+        values (ndarray): (n_entities, n_years) values.
+        world (ndarray): World totals per year for the share; defaults to the
+                         'World' row if present.
+        aggregates (iterable): Entities excluded from the rankings.
+
+    Returns:
+        pandas.DataFrame: Long table with one row per (Entity, Year) observed:
+            'Value', 'YoY', 'CAGR', 'Share', 'Rank', plus the projections
+            'Linear' and 'LogLinear' for the years after the last one.
+    """
+    if world is None:
+        world_rows = np.flatnonzero(entities == 'World')
+        world = values[world_rows[0]] if world_rows.size else np.full(len(years), np.nan)
+    eligible = ~np.isin(entities, list(aggregates) + ['World'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = values / world[None, :]
+    stats = {
+        'Value': values,
+        'YoY': growth(values),
+        'CAGR': rolling_cagr(values),
+        'Share': share,
+        'Rank': ranks(values, eligible),
+    }
+    n_entities, n_years = values.shape
+    observed = pd.DataFrame({
+        'Entity': np.repeat(entities, n_years),
+        'Year': np.tile(years, n_entities),
+        **{name: matrix.ravel() for name, matrix in stats.items()}
+    }).dropna(subset=['Value'])
+
+    future = np.arange(years[-1] + 1, years[-1] + 1 + PROJECTION_HORIZON)
+    slope, intercept = fit_trends(years, values)
+    log_slope, log_intercept = fit_trends(years, values, log=True)
+    projected = pd.DataFrame({
+        'Entity': np.repeat(entities, len(future)),
+        'Year': np.tile(future, n_entities),
+        'Linear': (slope[:, None] * future[None, :] + intercept[:, None]).ravel(),
+        'LogLinear': np.exp(log_slope[:, None] * future[None, :] + log_intercept[:, None]).ravel(),
+    })
+    return pd.concat([observed, projected], ignore_index=True)
+
+
+@st.cache_data(max_entries=8)
+def load_trends(dataset, fingerprint):
+    """
+    Cached `compute_trends` for one dataset version.
+
+    `fingerprint` only keys the cache; use `trends` to get the current version.
+    """
+    _, load, value_col, _ = TREND_DATASETS[dataset]
+    df = load()
+    if df.empty:
+        return pd.DataFrame()
+    entities, years, values = entity_year_matrix(df, value_col)
+    return compute_trends(entities, years, values, aggregates=load_hierarchy().aggregates)
+
+
+def trends(dataset):
+    """Trend table of `dataset` (see `compute_trends`) for the current source files."""
+    sources = TREND_DATASETS[dataset][3]
+    return load_trends(dataset, file_fingerprint(*(os.path.join(DATA_PATH, f) for f in sources)))
+
+
+@partial('Rankings y tendencias')
+def trend_rankings():
+    """
+    Displays the rankings view: a bump chart of the top entities per year and
+    a table with growth, CAGR, share of world and projections for the last year.
+    Runs as a fragment, so its selectors do not rerun the rest of the page.
+    """
+    labels = {label: name for name, (label, *_) in TREND_DATASETS.items()}
+    label = st.selectbox('Conjunto de datos', options=labels)
+    dataset = labels[label]
+    df = trends(dataset)
+    observed = df.dropna(subset=['Value']) if not df.empty else df
+    ranked = observed.dropna(subset=['Rank']) if not observed.empty else observed
+    if ranked.empty:
+        st.warning("No hay suficientes entidades para calcular rankings en este conjunto de datos.")
+        return
+
+    last_year = int(ranked['Year'].max())
+    max_top = int(ranked.loc[ranked['Year'] == last_year, 'Rank'].max())
+    top_n = st.slider('Número de entidades', 2, max_top, min(10, max_top)) if max_top > 2 else max_top
+
+    # Bump chart: entities in the top N of the last year, ranked over time
+    leaders = ranked.loc[(ranked['Year'] == last_year) & (ranked['Rank'] <= top_n), 'Entity']
+    bump = ranked[ranked['Entity'].isin(leaders)]
+    fig = px.line(
+        bump, x='Year', y='Rank', color='Entity', markers=True,
+        title=f'Ranking por año (top {top_n} en {last_year})',
+        labels={'Year': 'Año', 'Rank': 'Posición'},
+        hover_data={'Value': ':,.2f'}
+    )
+    fig.update_yaxes(autorange='reversed', dtick=1)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader(f"Indicadores en {last_year}")
+    projections = df[df['Year'] == last_year + PROJECTION_HORIZON].set_index('Entity')[['Linear', 'LogLinear']]
+    table = (observed[observed['Year'] == last_year]
+             .set_index('Entity')[['Rank', 'Value', 'YoY', 'CAGR', 'Share']]
+             .join(projections)
+             .sort_values('Rank', na_position='last')
+             .reset_index())
+    st.dataframe(
+        table,
+        column_config={
+            'Entity': 'Entidad',
+            'Rank': st.column_config.NumberColumn('Posición', format='%d'),
+            'Value': st.column_config.NumberColumn('Valor', format='%.2f'),
+            'YoY': st.column_config.NumberColumn('Crecimiento anual', format='percent'),
+            'CAGR': st.column_config.NumberColumn(f'CAGR {CAGR_WINDOW} años', format='percent'),
+            'Share': st.column_config.NumberColumn('Cuota mundial', format='percent'),
+            'Linear': st.column_config.NumberColumn(f'Proyección lineal {last_year + PROJECTION_HORIZON}', format='%.2f'),
+            'LogLinear': st.column_config.NumberColumn(f'Proyección log-lineal {last_year + PROJECTION_HORIZON}', format='%.2f'),
+        },
+        hide_index=True
+    )
+    export_data(df, 'tendencias', dataset)
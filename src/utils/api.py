@@ -0,0 +1,263 @@
+"""
+Local read-only data API.
+
+Serves the same cleaned series the dashboard uses (through the cached loaders
+in `utils.data`) over plain HTTP, so other internal tools don't need to scrape
+the Streamlit UI. Started once per process from the sidebar, or standalone
+with `PYTHONPATH=src python -m utils.api` from the repository root.
+
+Endpoints:
+    GET /metrics
+        Process metrics in the Prometheus text format (see `utils.metrics`).
+    GET /datasets
+        JSON list of datasets with their columns, row count and fingerprint.
+    GET /datasets/<name>?entity=..&iso=..&field=..&year=..&year_from=..&year_to=..&format=json|csv|arrow
+        A slice of one dataset. `entity`, `iso` and `field` can be repeated. Large
+        slices are streamed in chunks; responses carry an ETag derived from
+        the dataset fingerprint and the query, and honor If-None-Match.
+"""
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import streamlit as st
+
+from utils.config import DATA_PATH, CSV_PUB, CSV_INV, CSV_PRINV, WORLD_MAP, DATA_API_HOST, DATA_API_PORT
+from utils.data import (
+    load_annual_papers_map_data, load_publications_long,
+    load_global_investment_data, load_private_ai_investment_data
+)
+from utils.datasets import generic_datasets, load_table
+from utils.fingerprint import file_fingerprint
+from utils.metrics import exposition
+
+logger = logging.getLogger(__name__)
+
+# Rows per streamed chunk
+CHUNK_ROWS = 5000
+
+# Dataset name -> (loader returning a DataFrame, source files used for the fingerprint)
+API_DATASETS = {
+    'papers': (lambda: load_annual_papers_map_data()[0], [CSV_PUB, WORLD_MAP]),
+    'papers-by-field': (load_publications_long, [CSV_PUB]),
+    'global-investment': (load_global_investment_data, [CSV_INV]),
+    'private-investment': (load_private_ai_investment_data, [CSV_PRINV]),
+}
+# Every other registered dataset is served under its registry name
+API_DATASETS.update({
+    spec.name: (functools.partial(load_table, spec.name), [spec.csv]) for spec in generic_datasets()
+})
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'metrics': 'text/plain; version=0.0.4; charset=utf-8',
+}
+
+
+def dataset_fingerprint(name):
+    """Fingerprint of the source files behind an API dataset."""
+    _, files = API_DATASETS[name]
+    return file_fingerprint(*(os.path.join(DATA_PATH, f) for f in files))
+
+
+def filter_slice(df, params):
+    """
+    Applies the entity/year query parameters to a dataset.
+
+    Args:
+        df (pandas.DataFrame): Full dataset.
+        params (dict): Parsed query string (values are lists).
+
+    Returns:
+        pandas.DataFrame: The matching rows.
+    """
+    mask = None
+
+    def combine(m):
+        return m if mask is None else mask & m
+
+    if 'entity' in params:
+        mask = combine(df['Entity'].isin(params['entity']))
+    if 'field' in params and 'Field' in df.columns:
+        mask = combine(df['Field'].isin(params['field']))
+    if 'iso' in params and 'iso_a3' in df.columns:
+        mask = combine(df['iso_a3'].isin([c.upper() for c in params['iso']]))
+    if 'year' in params:
+        mask = combine(df['Year'].isin([int(y) for y in params['year']]))
+    if 'year_from' in params:
+        mask = combine(df['Year'] >= int(params['year_from'][0]))
+    if 'year_to' in params:
+        mask = combine(df['Year'] <= int(params['year_to'][0]))
+    return df if mask is None else df[mask]
+
+
+def iter_json(df):
+    """Yields a JSON array of records in chunks."""
+    yield b'['
+    for start in range(0, len(df), CHUNK_ROWS):
+        records = df.iloc[start:start + CHUNK_ROWS].to_json(orient='records')[1:-1]
+        yield (',' if start else '').encode() + records.encode()
+    yield b']'
+
+
+def iter_csv(df):
+    """Yields CSV text in chunks, with the header in the first one."""
+    for start in range(0, max(len(df), 1), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS].to_csv(index=False, header=start == 0)
+        yield chunk.encode('utf-8')
+
+
+def iter_arrow(df):
+    """Yields an Arrow IPC stream, one record batch per chunk."""
+    import pyarrow as pa  # Installed with streamlit; imported lazily as only this format needs it
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=CHUNK_ROWS):
+            writer.write_batch(batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()  # End-of-stream marker
+
+
+SERIALIZERS = {'json': iter_json, 'csv': iter_csv, 'arrow': iter_arrow}
+
+
+class DataAPIHandler(BaseHTTPRequestHandler):
+    """Request handler for the read-only data API."""
+
+    protocol_version = 'HTTP/1.1'  # Needed for chunked transfer encoding
+    server_version = 'VDDataAPI/1.0'
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPES['json'])
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_text(self, status, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_stream(self, chunks, content_type, headers):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if parts == ['metrics']:
+                self.send_text(200, exposition(), CONTENT_TYPES['metrics'])
+            elif parts == ['datasets']:
+                self.list_datasets()
+            elif len(parts) == 2 and parts[0] == 'datasets':
+                self.get_dataset(parts[1], parse_qs(url.query))
+            else:
+                self.send_json(404, {'error': f"Unknown path '{url.path}'"})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+
+    def list_datasets(self):
+        payload = []
+        for name, (load, _) in API_DATASETS.items():
+            df = load()
+            payload.append({
+                'name': name,
+                'columns': df.columns.tolist(),
+                'rows': len(df),
+                'fingerprint': dataset_fingerprint(name),
+            })
+        self.send_json(200, payload)
+
+    def get_dataset(self, name, params):
+        if name not in API_DATASETS:
+            self.send_json(404, {'error': f"Unknown dataset '{name}'"})
+            return
+        fmt = params.pop('format', ['json'])[0]
+        if fmt not in SERIALIZERS:
+            raise ValueError(f"Unsupported format '{fmt}'. Expected one of {sorted(SERIALIZERS)}.")
+
+        query = json.dumps(sorted((k, sorted(v)) for k, v in params.items()))
+        etag = '"' + hashlib.sha1(f"{dataset_fingerprint(name)}|{fmt}|{query}".encode()).hexdigest()[:20] + '"'
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_not_modified(etag)
+            return
+
+        df = filter_slice(API_DATASETS[name][0](), params)
+        self.send_stream(SERIALIZERS[fmt](df), CONTENT_TYPES[fmt], {
+            'ETag': etag,
+            'Cache-Control': 'no-cache',
+            'X-Total-Rows': str(len(df)),
+        })
+
+
+def serve(host=DATA_API_HOST, port=DATA_API_PORT):
+    """Creates the API server bound to host:port (does not start it)."""
+    server = ThreadingHTTPServer((host, port), DataAPIHandler)
+    server.daemon_threads = True
+    return server
+
+
+@st.cache_resource
+def start_data_api():
+    """
+    Starts the data API in a background thread, once per process.
+
+    Returns:
+        ThreadingHTTPServer: The running server, or None if the API is disabled
+                             (port 0) or the port is already taken (e.g. by
+                             another app process sharing the host).
+    """
+    if not DATA_API_PORT:
+        return None
+    try:
+        server = serve()
+    except OSError as e:
+        logger.warning("Data API not started on %s:%s: %s", DATA_API_HOST, DATA_API_PORT, e)
+        return None
+    threading.Thread(target=server.serve_forever, name='data-api', daemon=True).start()
+    logger.info("Data API listening on http://%s:%s", DATA_API_HOST, DATA_API_PORT)
+    return server
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    logger.info("Data API listening on http://%s:%s", DATA_API_HOST, DATA_API_PORT)
+    serve().serve_forever()
@@ -0,0 +1,210 @@
+"""
+Memory-mapped dataset artifacts shared between server processes.
+
+When several Streamlit processes serve the app (e.g. behind a load balancer),
+each one would normally parse the CSVs and the GeoJSON and keep private
+copies in `st.cache_data`. With `SHARED_ARTIFACTS` enabled, loader results are
+written once as uncompressed Arrow IPC files and every process opens them
+read-only through `mmap`: the data pages live in the OS page cache and are
+shared, so an extra worker mostly costs its interpreter.
+
+Each process converts an artifact back to a DataFrame once per fingerprint
+and keeps it, so reruns get the same frame instead of rebuilding it (and
+re-decoding the geometry) on every call. Numeric columns without nulls stay
+zero-copy views of the mapping.
+
+The stages of the dataset pipeline (`utils.datasets`) are served this way: the
+cube, the field tables, the map rows and the world geometry of every dataset,
+so the views and the `utils.data` loaders built on them all read the mapped
+frames. Artifacts are tagged with the fingerprint of their source files and
+rebuilt automatically when a source changes. They can be prebuilt before
+starting the workers with `PYTHONPATH=src python -m utils.artifacts` from the
+repository root.
+"""
+import functools
+import inspect
+import os
+import re
+
+import geopandas as gpd
+import pyarrow as pa
+
+from utils.config import DATA_PATH, ARTIFACT_DIR, SHARED_ARTIFACTS
+from utils.fingerprint import file_fingerprint
+
+# name -> (fingerprint, pyarrow.Table backed by a memory map)
+_tables = {}
+# name -> (fingerprint, DataFrame converted from the table)
+_frames = {}
+
+
+def artifact_path(name):
+    """Path of the Arrow file for artifact `name` (unsafe file name characters become '_')."""
+    return os.path.join(ARTIFACT_DIR, f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}.arrow")
+
+
+def write_artifact(name, df, fingerprint):
+    """
+    Writes a DataFrame or GeoDataFrame as an uncompressed Arrow IPC file.
+
+    Geometries are stored as WKB. The file is written next to its final path
+    and renamed atomically, so concurrent workers never map a partial file.
+    """
+    metadata = {b'fingerprint': fingerprint.encode()}
+    if isinstance(df, gpd.GeoDataFrame) and df.active_geometry_name in df.columns:
+        geometry = df.geometry
+        metadata[b'geometry'] = geometry.name.encode()
+        if geometry.crs is not None:
+            metadata[b'crs'] = geometry.crs.to_string().encode()
+        df = df.drop(columns=[geometry.name]).assign(**{geometry.name: geometry.to_wkb()})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path = artifact_path(name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    _tables.pop(name, None)
+    _frames.pop(name, None)
+
+
+def open_artifact(name, fingerprint):
+    """
+    Maps artifact `name` read-only.
+
+    Returns:
+        pyarrow.Table: Zero-copy table over the memory-mapped file, or None if
+                       the artifact is missing or was built from other sources.
+    """
+    cached = _tables.get(name)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    try:
+        table = pa.ipc.open_file(pa.memory_map(artifact_path(name), 'r')).read_all()
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    if (table.schema.metadata or {}).get(b'fingerprint') != fingerprint.encode():
+        return None
+    _tables[name] = (fingerprint, table)
+    return table
+
+
+def to_frame(table):
+    """
+    Converts a mapped artifact back to the object its loader returned.
+
+    With `split_blocks`, numeric columns without nulls are read-only views of
+    the shared mapping; strings, categoricals and geometries are decoded into
+    process memory.
+    """
+    metadata = table.schema.metadata or {}
+    geometry_name = metadata.get(b'geometry')
+    if geometry_name is None:
+        return table.to_pandas(split_blocks=True)
+    geometry_name = geometry_name.decode()
+    df = table.drop_columns([geometry_name]).to_pandas(split_blocks=True)
+    geometry = gpd.GeoSeries.from_wkb(table[geometry_name].to_numpy(zero_copy_only=False))
+    crs = metadata.get(b'crs')
+    return gpd.GeoDataFrame(df, geometry=geometry.values, crs=crs.decode() if crs else None)
+
+
+def open_frame(name, fingerprint):
+    """
+    DataFrame of artifact `name`, converted once per process and fingerprint.
+
+    Returns:
+        pandas.DataFrame: A shallow copy of the process-wide frame (adding or
+                          replacing columns does not leak into other callers),
+                          or None if the artifact is missing or stale.
+    """
+    cached = _frames.get(name)
+    if cached is None or cached[0] != fingerprint:
+        table = open_artifact(name, fingerprint)
+        if table is None:
+            return None
+        cached = _frames[name] = (fingerprint, to_frame(table))
+    return cached[1].copy(deep=False)
+
+
+def shared_artifacts(artifacts):
+    """
+    Serves a loader's result from memory-mapped artifacts when SHARED_ARTIFACTS is on.
+
+    Args:
+        artifacts (dict): Artifact name -> source files (relative to DATA_PATH)
+            it depends on, or None for a loader that takes the fingerprint of
+            its sources as its `fingerprint` argument (the pipeline stages).
+            A loader returning a tuple declares one artifact per element, in
+            order. Names may contain `{arg}` placeholders, filled with the
+            loader's arguments, so each argument combination gets its own
+            artifact.
+
+    Example:
+        @shared_artifacts({'table_{name}_{field}': None})
+        @cached_loader
+        def _load_table(name, field, fingerprint): ...
+    """
+    def decorator(loader):
+        signature = inspect.signature(loader)
+
+        def resolve(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return [
+                (name.format(**bound.arguments),
+                 bound.arguments['fingerprint'] if sources is None
+                 else file_fingerprint(*(os.path.join(DATA_PATH, f) for f in sources)))
+                for name, sources in artifacts.items()
+            ]
+
+        def write(resolved, result):
+            parts = result if len(resolved) > 1 else (result,)
+            for (name, fp), part in zip(resolved, parts):
+                write_artifact(name, part, fp)
+
+        served = set()  # Artifact names this loader has resolved, for `clear`
+
+        @functools.wraps(loader)
+        def wrapper(*args, **kwargs):
+            if not SHARED_ARTIFACTS:
+                return loader(*args, **kwargs)
+            resolved = resolve(args, kwargs)
+            served.update(name for name, _ in resolved)
+            frames = [open_frame(name, fp) for name, fp in resolved]
+            if any(frame is None for frame in frames):
+                result = loader(*args, **kwargs)
+                write(resolved, result)
+                return result
+            return tuple(frames) if len(frames) > 1 else frames[0]
+
+        def build(*args, **kwargs):
+            """(Re)writes the artifacts for these arguments unconditionally."""
+            write(resolve(args, kwargs), loader(*args, **kwargs))
+
+        def clear():
+            """Drops this process's converted frames and the loader's own cache, if any."""
+            for name in served:
+                _tables.pop(name, None)
+                _frames.pop(name, None)
+            getattr(loader, 'clear', lambda: None)()
+
+        wrapper.build = build
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+
+def build_all():
+    """Prebuilds the pipeline artifacts of every registered dataset (all fields) and the world geometry."""
+    from utils import datasets
+
+    for spec in datasets.registry().values():
+        datasets.build_artifacts(spec.name)
+    datasets.build_artifacts()
+    print(f"Built artifacts in {ARTIFACT_DIR}")
+
+
+if __name__ == '__main__':
+    build_all()
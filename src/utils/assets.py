@@ -0,0 +1,209 @@
+"""
+Static assets of the home page.
+
+Images under IMG_DIR are compiled into ASSET_DIR (inside Streamlit's static
+folder): one resized variant per width in ASSET_WIDTHS and format in
+ASSET_FORMATS, plus a copy of the original as fallback, all with
+content-hashed names (`<stem>-<width>w.<hash>.<ext>`), so a URL always
+identifies one exact file and can be cached forever. `manifest.json` records
+the variants of each source with the source's fingerprint; only new or changed
+images are re-encoded.
+
+The page embeds an image as a `<picture>` with a `srcset`, so the browser
+downloads only the variant that fits its viewport. AVIF variants are built
+too, for deployments that serve ASSET_DIR from a CDN, but are not referenced
+by the page: Streamlit's static handler serves `.avif` as `text/plain` with
+`nosniff`, which browsers refuse to decode.
+
+Build ahead of time (e.g. in a deploy step) from the repository root with:
+
+    PYTHONPATH=src python -m utils.assets
+
+Otherwise the first page run builds whatever is missing.
+"""
+import hashlib
+import html
+import io
+import json
+import os
+
+import streamlit as st
+from PIL import Image, features
+
+from utils.config import IMG_DIR, ASSET_DIR, ASSET_URL, ASSET_WIDTHS
+from utils.fingerprint import file_fingerprint
+
+# Format -> Pillow save options
+ASSET_FORMATS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 80, 'method': 6},
+}
+# Formats the page references (see the module docstring for AVIF)
+SERVED_FORMATS = ('webp',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+MANIFEST = 'manifest.json'
+
+
+def _content_name(stem, data, ext, width=None):
+    digest = hashlib.sha1(data).hexdigest()[:10]
+    return f"{stem}-{width}w.{digest}.{ext}" if width else f"{stem}.{digest}.{ext}"
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **ASSET_FORMATS[fmt])
+    return buffer.getvalue()
+
+
+def build_image(path, out_dir=ASSET_DIR, widths=ASSET_WIDTHS):
+    """
+    Writes the variants of one image.
+
+    Widths larger than the original are skipped; the original width is always
+    included. Formats whose encoder is missing from this Pillow build are skipped.
+
+    Returns:
+        dict: Manifest entry with the source 'fingerprint', 'width', 'height',
+              the 'fallback' file (hashed copy of the original) and the list of
+              'variants' ({'format', 'width', 'file', 'bytes'}).
+    """
+    stem, ext = os.path.splitext(os.path.basename(path))
+    with open(path, 'rb') as f:
+        original = f.read()
+    fallback = _content_name(stem, original, ext.lstrip('.').lower())
+    with open(os.path.join(out_dir, fallback), 'wb') as f:
+        f.write(original)
+
+    variants = []
+    with Image.open(path) as image:
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        sizes = sorted({w for w in widths if w < image.width} | {image.width})
+        for width in sizes:
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in ASSET_FORMATS:
+                if not features.check(fmt):
+                    continue
+                data = _encode(resized, fmt)
+                name = _content_name(stem, data, fmt, width)
+                with open(os.path.join(out_dir, name), 'wb') as f:
+                    f.write(data)
+                variants.append({'format': fmt, 'width': width, 'file': name, 'bytes': len(data)})
+        return {
+            'fingerprint': file_fingerprint(path),
+            'width': image.width,
+            'height': image.height,
+            'fallback': fallback,
+            'bytes': len(original),
+            'variants': variants,
+        }
+
+
+def _entry_files(entry):
+    return {entry['fallback'], *(v['file'] for v in entry['variants'])}
+
+
+def build_assets(src_dir=IMG_DIR, out_dir=ASSET_DIR):
+    """
+    Brings ASSET_DIR up to date with the images in `src_dir`.
+
+    Returns:
+        dict: The manifest, source file name -> entry of `build_image`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    sources = sorted(n for n in os.listdir(src_dir) if n.lower().endswith(IMAGE_EXTENSIONS))
+    updated = {}
+    for name in sources:
+        path = os.path.join(src_dir, name)
+        entry = manifest.get(name)
+        if (entry is None or entry['fingerprint'] != file_fingerprint(path)
+                or not all(os.path.exists(os.path.join(out_dir, f)) for f in _entry_files(entry))):
+            entry = build_image(path, out_dir)
+        updated[name] = entry
+
+    # Drop files that no current entry references (old versions, removed images)
+    keep = {MANIFEST}.union(*(_entry_files(e) for e in updated.values()))
+    for entry in os.scandir(out_dir):
+        if entry.is_file() and entry.name not in keep and not entry.name.endswith('.tmp'):
+            os.remove(entry.path)
+
+    if updated != manifest:
+        tmp = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(updated, f, indent=2)
+        os.replace(tmp, manifest_path)  # Atomic for concurrent app processes
+    return updated
+
+
+@st.cache_resource(max_entries=2)
+def _asset_manifest(fingerprint):
+    """Manifest for one version of IMG_DIR (`fingerprint` is the cache key)."""
+    return build_assets()
+
+
+def asset_manifest():
+    """Up-to-date asset manifest, rebuilt only when an image under IMG_DIR changes."""
+    sources = sorted(n for n in os.listdir(IMG_DIR) if n.lower().endswith(IMAGE_EXTENSIONS))
+    return _asset_manifest(file_fingerprint(*(os.path.join(IMG_DIR, n) for n in sources)))
+
+
+def picture_html(name, alt='', sizes='100vw'):
+    """
+    `<picture>` element for an image of IMG_DIR, with one `srcset` per served format.
+
+    Args:
+        name (str): File name under IMG_DIR (e.g. 'main_header.png').
+        alt (str): Alternative text.
+        sizes (str): `sizes` attribute, the rendered width of the image.
+    """
+    entry = asset_manifest()[name]
+    sources = []
+    for fmt in SERVED_FORMATS:
+        srcset = ', '.join(f"{ASSET_URL}/{v['file']} {v['width']}w"
+                           for v in entry['variants'] if v['format'] == fmt)
+        if srcset:
+            sources.append(f'<source type="image/{fmt}" srcset="{srcset}" sizes="{sizes}">')
+    return (
+        '<picture>' + ''.join(sources)
+        + f'<img src="{ASSET_URL}/{entry["fallback"]}" alt="{html.escape(alt)}" '
+        f'width="{entry["width"]}" height="{entry["height"]}" style="width: 100%; height: auto;">'
+        + '</picture>'
+    )
+
+
+def header_image(name, alt=''):
+    """Renders a full-width image of IMG_DIR through its compiled variants."""
+    st.markdown(picture_html(name, alt), unsafe_allow_html=True)
+
+
+@st.cache_resource(max_entries=2)
+def _read_markdown(path, fingerprint):
+    """Contents of a markdown file, once per version (`fingerprint` is the cache key)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def markdown_document(path):
+    """
+    Markdown text of `path`, served from memory while the file is unchanged.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return _read_markdown(path, file_fingerprint(path))
+
+
+if __name__ == '__main__':
+    for source, entry in build_assets().items():
+        print(f"{source}: {entry['width']}x{entry['height']}, original {entry['bytes'] / 1024:.1f} KiB")
+        for variant in entry['variants']:
+            print(f"  {variant['format']:<5} {variant['width']:>5}w {variant['bytes'] / 1024:>8.1f} KiB  {variant['file']}")
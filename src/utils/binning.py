@@ -0,0 +1,153 @@
+"""
+Choropleth binning engine.
+
+Class breaks are computed once over the full (entity x year) value range of a
+dataset instead of per yearly slice, so a given color means the same thing on
+every year of a map and the legend does not shift while the year slider moves.
+The functions here are pure NumPy; the per-dataset, cached classes are built
+by the shared pipeline in `utils.datasets`.
+"""
+import numpy as np
+from branca.colormap import StepColormap
+
+BINNING_METHODS = ('quantile', 'log', 'jenks')
+
+# ColorBrewer YlOrRd (9 classes), the same ramp folium.Choropleth used before.
+YLORRD = [
+    '#ffffcc', '#ffeda0', '#fed976', '#feb24c', '#fd8d3c',
+    '#fc4e2a', '#e31a1c', '#bd0026', '#800026'
+]
+
+# Natural breaks are O(k * n^2); larger inputs are reduced to evenly spaced
+# quantiles first, which keeps the result practically identical.
+JENKS_MAX_SAMPLE = 1000
+
+
+def _clean_values(values):
+    """Returns the finite values of `values` as a sorted float array."""
+    x = np.asarray(values, dtype=float)
+    return np.sort(x[np.isfinite(x)])
+
+
+def _jenks_breaks(x, n_bins):
+    """
+    Fisher-Jenks natural breaks over the sorted array `x`.
+
+    Minimizes the within-class sum of squared deviations with dynamic
+    programming; the inner minimization is vectorized with prefix sums.
+    """
+    if len(x) > JENKS_MAX_SAMPLE:
+        x = np.quantile(x, np.linspace(0, 1, JENKS_MAX_SAMPLE))
+    n = len(x)
+    n_bins = min(n_bins, n)
+    s1 = np.concatenate(([0.0], np.cumsum(x)))
+    s2 = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    def ssd(start, end):
+        # Sum of squared deviations of x[start:end + 1]
+        count = end - start + 1
+        total = s1[end + 1] - s1[start]
+        return (s2[end + 1] - s2[start]) - total * total / count
+
+    idx = np.arange(n)
+    cost = np.full((n_bins, n), np.inf)
+    start_of_last = np.zeros((n_bins, n), dtype=int)
+    cost[0] = ssd(0, idx)
+    for j in range(1, n_bins):
+        for i in range(j, n):
+            starts = np.arange(j, i + 1)
+            candidates = cost[j - 1, starts - 1] + ssd(starts, i)
+            best = int(np.argmin(candidates))
+            cost[j, i] = candidates[best]
+            start_of_last[j, i] = starts[best]
+
+    # Walk back the class boundaries; each class is bounded by its upper value
+    uppers = [x[-1]]
+    end = n - 1
+    for j in range(n_bins - 1, 0, -1):
+        start = start_of_last[j, end]
+        uppers.append(x[start - 1])
+        end = start - 1
+    return np.array([x[0]] + uppers[::-1])
+
+
+def compute_breaks(values, method='quantile', n_bins=7):
+    """
+    Computes class breaks for a set of values.
+
+    Args:
+        values (array-like): All values the map can display (every entity and year).
+        method (str): One of 'quantile', 'log' or 'jenks'.
+        n_bins (int): Requested number of classes.
+
+    Returns:
+        numpy.ndarray: Edges `[min, upper_1, ..., max]`, increasing except that
+                       `upper_1` may equal `min` (a class holding only the
+                       minimum). Duplicate upper edges are dropped, so fewer
+                       than `n_bins` classes may be returned for data with many
+                       ties. Empty if there are no finite values.
+    """
+    if method not in BINNING_METHODS:
+        raise ValueError(f"Unknown binning method '{method}'. Expected one of {BINNING_METHODS}.")
+    x = _clean_values(values)
+    if x.size == 0:
+        return np.array([])
+    if x[0] == x[-1]:
+        return np.array([x[0], x[-1]])
+
+    if method == 'quantile':
+        breaks = np.quantile(x, np.linspace(0, 1, n_bins + 1))
+    elif method == 'log':
+        positive = x[x > 0]
+        low = positive[0] if positive.size else 1.0
+        breaks = np.geomspace(low, max(x[-1], low), n_bins + 1)
+        breaks[0] = min(breaks[0], x[0])
+    else:
+        breaks = _jenks_breaks(x, n_bins)
+    # Dedupe the upper edges only: when the first class holds just the minimum,
+    # its upper edge equals breaks[0] and both must stay (see `assign_bins`)
+    return np.concatenate(([breaks[0]], np.unique(breaks[1:])))
+
+
+def assign_bins(values, breaks):
+    """
+    Maps values to class indices for the given breaks.
+
+    Classes are closed on their upper edge, so `breaks[i] < v <= breaks[i + 1]`
+    falls in class `i` (the lowest class also includes `breaks[0]`). NaNs map to -1.
+    """
+    v = np.asarray(values, dtype=float)
+    bins = np.searchsorted(breaks[1:-1], v, side='left')
+    bins = np.clip(bins, 0, max(len(breaks) - 2, 0))
+    return np.where(np.isfinite(v), bins, -1)
+
+
+def bin_palette(n_bins, palette=YLORRD):
+    """Picks `n_bins` evenly spaced colors from `palette`."""
+    if n_bins <= 0:
+        return []
+    positions = np.linspace(0, len(palette) - 1, n_bins).round().astype(int)
+    return [palette[p] for p in positions]
+
+
+def color_lookup(keys, values, breaks, colors):
+    """
+    Builds a `{key: color}` dict for one map slice.
+
+    Keys whose value is missing are left out, so callers can fall back to
+    their "no data" style.
+    """
+    bins = assign_bins(values, breaks)
+    return {key: colors[b] for key, b in zip(keys, bins) if b >= 0}
+
+
+def legend(breaks, colors, caption):
+    """Returns a stepped branca legend for precomputed breaks and colors."""
+    breaks = list(breaks)
+    return StepColormap(
+        colors,
+        index=breaks,
+        vmin=breaks[0],
+        vmax=breaks[-1],
+        caption=caption
+    )
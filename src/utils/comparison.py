@@ -0,0 +1,165 @@
+"""
+Multi-entity comparison view.
+
+Any set of entities of a registered dataset can be plotted side by side. The
+series come from the per-entity store of `utils.datasets.load_entity_series`:
+each one is a slice of contiguous arrays, so a selection change never filters
+the full table. Optionally the values are normalized as a share of World in
+the same year or as an index to a base year (= 100). Traces are WebGL
+(`Scattergl`), so dozens of series stay responsive.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from utils.datasets import load_entity_series, load_fields
+from utils.export import export_data
+from utils.regions import WORLD
+from utils.registry import registry
+from utils.reruns import partial
+
+NORMALIZATIONS = {
+    'Valores absolutos': 'absolute',
+    'Cuota del mundo (%)': 'share',
+    'Índice (año base = 100)': 'index',
+}
+DEFAULT_SELECTION_SIZE = 5
+
+
+def share_of_world(years, values, world_years, world_values):
+    """
+    Values as a percentage of World in the same year.
+
+    Returns:
+        numpy.ndarray: Percentages, NaN for years World has no (or zero) data.
+    """
+    out = np.full(len(values), np.nan)
+    if len(world_years) == 0:
+        return out
+    pos = np.minimum(np.searchsorted(world_years, years), len(world_years) - 1)
+    matched = (world_years[pos] == years) & (world_values[pos] != 0)
+    out[matched] = values[matched] / world_values[pos[matched]] * 100
+    return out
+
+
+def index_to_base(years, values, base_year):
+    """
+    Values as an index with `base_year` = 100.
+
+    Returns:
+        numpy.ndarray: The index, or None if the series has no nonzero value in `base_year`.
+    """
+    pos = np.searchsorted(years, base_year)
+    if pos == len(years) or years[pos] != base_year or values[pos] == 0:
+        return None
+    return values / values[pos] * 100
+
+
+def normalized_series(store, entities, mode='absolute', base_year=None):
+    """
+    Series of the selected entities, normalized.
+
+    Args:
+        store (utils.datasets.EntitySeries): Per-entity series.
+        entities (list): Entities to compare.
+        mode (str): 'absolute', 'share' or 'index' (see NORMALIZATIONS).
+        base_year (int): Base year of the 'index' mode.
+
+    Returns:
+        tuple: (series, skipped). `series` maps each entity to (years, values)
+               arrays; `skipped` lists the entities that cannot be normalized
+               (no World series for 'share', no data in the base year for 'index').
+    """
+    series, skipped = {}, []
+    world = store.get(WORLD) if mode == 'share' and WORLD in store else None
+    for entity in entities:
+        years, values = store.get(entity)
+        if mode == 'share':
+            if world is None:
+                skipped.append(entity)
+                continue
+            values = share_of_world(years, values, *world)
+        elif mode == 'index':
+            values = index_to_base(years, values, base_year)
+            if values is None:
+                skipped.append(entity)
+                continue
+        series[entity] = (years, values)
+    return series, skipped
+
+
+def comparison_figure(series, y_title, title):
+    """One WebGL line trace per entity."""
+    fig = go.Figure()
+    for entity, (years, values) in series.items():
+        fig.add_trace(go.Scattergl(x=years, y=values, mode='lines+markers', name=entity))
+    fig.update_layout(
+        title=title,
+        xaxis_title='Año',
+        yaxis_title=y_title,
+        hovermode='x unified',
+        legend_title_text='Entidad'
+    )
+    return fig
+
+
+@partial('Comparación de entidades')
+def entity_comparison():
+    """
+    Displays the comparison view: a dataset (and field) selector, a
+    multiselect of entities, the normalization mode and one line per entity.
+    Runs as a fragment, so its selectors do not rerun the rest of the page.
+    """
+    datasets = {spec.label: spec for spec in registry().values()}
+    spec = datasets[st.selectbox('Conjunto de datos', options=datasets, key='comparison_dataset')]
+    field = None
+    if spec.has_fields:
+        field = st.selectbox('Campo', options=load_fields(spec.name), key=f'comparison_{spec.name}_field')
+
+    store = load_entity_series(spec.name, field)
+    if len(store) == 0:
+        st.warning(f"No hay datos disponibles para {spec.label}.")
+        return
+
+    default = [e for e in spec.selection if e in store] or store.entities[:DEFAULT_SELECTION_SIZE]
+    entities = st.multiselect(
+        'Entidades a comparar',
+        options=store.entities,
+        default=default,
+        key=f'comparison_{spec.name}_entities',
+        placeholder='Selecciona países o regiones...'
+    )
+    if not entities:
+        st.info("Selecciona al menos una entidad para comparar.")
+        return
+
+    label = st.radio('Normalización', options=NORMALIZATIONS, horizontal=True, key='comparison_mode')
+    mode = NORMALIZATIONS[label]
+    base_year = None
+    if mode == 'index':
+        first, last = store.year_range()
+        base_year = st.select_slider('Año base', options=list(range(first, last + 1)), value=first,
+                                     key=f'comparison_{spec.name}_base')
+
+    series, skipped = normalized_series(store, entities, mode, base_year)
+    if skipped:
+        reason = 'sin serie de World' if mode == 'share' else f'sin datos en {base_year}'
+        st.caption(f"Sin normalizar ({reason}): {', '.join(skipped)}")
+    if not series:
+        return
+
+    unit = f" ({spec.unit})" if spec.unit else ''
+    y_title = {'absolute': f"{spec.label}{unit}", 'share': '% del mundo', 'index': f'Índice ({base_year} = 100)'}[mode]
+    st.plotly_chart(comparison_figure(series, y_title, spec.title), use_container_width=True)
+
+    export_df = pd.DataFrame({
+        'Entity': np.repeat(list(series), [len(years) for years, _ in series.values()]),
+        'Year': np.concatenate([years for years, _ in series.values()]),
+        spec.value_name if mode == 'absolute' else y_title: np.concatenate([values for _, values in series.values()]),
+    })
+    # The export cache is keyed by the filter, so it must identify the selection too
+    selection = hashlib.sha1('\x1f'.join(series).encode()).hexdigest()[:8]
+    export_data(export_df, f'comparacion_{spec.name}', '_'.join(filter(None, [field, mode, str(base_year or ''), selection])))
@@ -1,6 +1,28 @@
+import os
+
 DATA_PATH = 'data'
 CSV_PUB = 'annual-scholarly-publications-on-artificial-intelligence/annual-scholarly-publications-on-artificial-intelligence.csv'
 CSV_INV = 'global-investment-in-generative-ai/global-investment-in-generative-ai.csv'
 CSV_PRINV = 'private-investment-in-artificial-intelligence/private-investment-in-artificial-intelligence.csv'
 WORLD_MAP = 'maps/world.geojson'
-TIMELINE_DATA = 'timeline.json'
\ No newline at end of file
+TIMELINE_DATA = 'timeline.json'
+PUB_CHUNK_ROWS = 50000
+MAP_BINNING = 'quantile'
+MAP_BINS = 7
+STATIC_MAP_DIR = 'src/static/maps'
+STATIC_MAP_URL = 'app/static/maps'
+STATIC_MAP_MAX_FILES = 200
+IMG_DIR = 'src/img'
+ASSET_DIR = 'src/static/assets'
+ASSET_URL = 'app/static/assets'
+ASSET_WIDTHS = (640, 1280, 1920)  # Resized variants of every image (plus its original width)
+DATA_API_HOST = os.environ.get('DATA_API_HOST', '127.0.0.1')
+DATA_API_PORT = int(os.environ.get('DATA_API_PORT', 8600))  # 0 disables the API
+ARTIFACT_DIR = '.cache/artifacts'
+SHARED_ARTIFACTS = os.environ.get('VD_SHARED_ARTIFACTS') == '1'  # Memory-mapped data shared by all workers
+DATAFRAME_ENGINE = os.environ.get('VD_DATAFRAME_ENGINE', 'pandas')  # 'pandas' or 'polars' (lazy)
+RERUN_REPORT = os.environ.get('VD_RERUN_REPORT') == '1'  # Rerun-scope report, also enabled with ?reruns=1
+PROFILE_ALWAYS = os.environ.get('VD_PROFILE') == '1'  # Profile every full rerun; ?profile=1 profiles one
+PROFILE_DIR = '.cache/profiles'
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+PROFILE_MAX_CAPTURES = 20
@@ -1,9 +1,22 @@
 options_dict = {
     'Inversión Global en IA Generativa': 0,
     'Publicaciones Anuales': 1,
+    'Rankings y Tendencias': 2,
+    'Comparar entidades': 3,
 }
 
 options_dict_views = {
     'Publicaciones Anuales': 0,
     'Inversión Privada en IA': 1
-}
\ No newline at end of file
+}
+
+options_dict_binning = {
+    'Cuantiles': 'quantile',
+    'Logarítmica': 'log',
+    'Cortes naturales (Jenks)': 'jenks'
+}
+
+options_dict_static_formats = {
+    'PNG': 'png',
+    'SVG': 'svg'
+}
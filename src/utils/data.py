@@ -2,58 +2,113 @@ import os
 import json
 import folium
 import pandas as pd
-import geopandas as gpd
 import plotly.express as px
 import streamlit as st
-import pycountry
 from streamlit_folium import st_folium
 
-from utils.config import DATA_PATH, CSV_PUB, CSV_INV, CSV_PRINV, WORLD_MAP
+from utils import binning
+from utils.config import DATA_PATH, WORLD_MAP, MAP_BINNING, MAP_BINS
+from utils.datasets import (
+    load_choropleth_bins, load_cube, load_fields, load_map_rows, load_query_table, load_query_year, load_table,
+    load_world_geo, load_year_slices, year_slice
+)
+from utils.engine import get_engine
+from utils.export import export_data
+from utils.fingerprint import file_fingerprint
+from utils.metrics import MAP_PAYLOAD_BYTES
+from utils.regions import load_hierarchy
+from utils.registry import get_spec
+from utils.reruns import partial
+
+PUB_FIELD_PREFIX = 'Number of articles - Field: '
+DEFAULT_FIELD = 'All'
+
+
+def load_publications_long():
+    """
+    Loads every research field of the annual scholarly publications data.
 
-groups = [
-    'Europe', 'South America', 'North America', 'Asia',
-    'United States'
-    ]
+    The 'papers' cube of the dataset registry (see `utils.datasets.ingest`):
+    read in chunks with compact dtypes, CSET groupings dropped and melted to
+    long format chunk by chunk.
 
-@st.cache_data
-def load_annual_papers_data():
+    Returns:
+        pandas.DataFrame: Columns 'Entity' (categorical), 'Code', 'Year',
+                          'Field' (categorical, in file order), 'Number of articles'
+                          and 'iso_a3'.
+                          Returns an empty DataFrame if the source file is not found or is empty.
+    """
+    return load_cube('papers')
+
+
+def publication_fields():
+    """
+    Returns the research fields available in the publications data, in file
+    order (the aggregate 'All' field comes first in the OWID export).
     """
-    Loads and processes the annual scholarly publications data.
+    fields = load_fields('papers')
+    return [DEFAULT_FIELD] if fields == [None] else fields
 
-    Reads data from the CSV file specified by CSV_PUB, filters out entries
-    containing "CSET" in the 'Entity' column, and renames the main data column
-    to 'Number of articles'.
+
+def load_annual_papers_data(field=DEFAULT_FIELD):
+    """
+    Loads the annual scholarly publications data of one research field.
+
+    Each field is sliced once from the publications cube and cached on its
+    own, so switching fields does not reshape the long table again.
+
+    Args:
+        field (str): Research field, see `publication_fields`.
 
     Returns:
-        pandas.DataFrame: Processed DataFrame with annual papers data.
+        pandas.DataFrame: Columns 'Entity', 'Code', 'Year', 'Number of articles' and 'iso_a3'.
                           Returns an empty DataFrame if the source file is not found or is empty.
     """
-    try:
-        path = os.path.join(DATA_PATH, CSV_PUB)
-        df = pd.read_csv(path)
-    except FileNotFoundError:
-        st.error(f"Error: The data file for annual papers ({CSV_PUB}) was not found at {path}.")
-        return pd.DataFrame()
+    return load_table('papers', field)
 
-    if df.empty:
-        return df # Return empty df if file was empty
 
-    df = df.query('not Entity.str.contains("CSET")')
+def comparison_groups(df, name):
+    """
+    Rows of the default comparison of a dataset: the continents of the entity
+    hierarchy plus the entities OWID selects by default (`DatasetSpec.selection`).
+
+    Args:
+        df (pandas.DataFrame): Table of the dataset (`utils.datasets.load_table`).
+        name (str): Registered dataset.
+    """
+    continents = load_hierarchy().mask(df['Entity'], 'continent')
+    return df[continents | df['Entity'].isin(get_spec(name).selection).to_numpy()]
+
 
-    df.rename(columns={
-        'Number of articles - Field: All': 'Number of articles'
-    }, inplace=True)
-    return df
+def field_selector(key=None):
+    """
+    Renders the research field selector of the publications views.
 
+    Returns:
+        str: The selected field.
+    """
+    fields = publication_fields()
+    return st.selectbox(
+        'Campo de investigación',
+        options=fields,
+        index=fields.index(DEFAULT_FIELD) if DEFAULT_FIELD in fields else 0,
+        key=key
+    )
 
+
+@partial('Publicaciones anuales')
 def annual_papers():
     """
     Displays a Streamlit chart for annual scholarly publications.
     Allows users to select an entity to view its specific data in a bar chart,
-    or view a scatter plot comparing predefined groups.
-    Includes an option for log scale on the Y-axis for the scatter plot.
+    or view a scatter plot comparing the continents and OWID's default
+    selection (`comparison_groups`, `papers_groups_chart`).
+    Includes a research field selector.
+
+    Runs as a fragment: changing the field or the entity reruns only this view.
     """
-    df = load_annual_papers_data()
+    field = field_selector()
+    df = load_annual_papers_data(field)
     if df.empty:
         st.warning("No hay datos disponibles sobre publicaciones anuales.")
         return
@@ -72,25 +127,8 @@ def annual_papers():
         placeholder='Selecciona un país para inspeccionar a detalle...'
     )
 
-    log_y_axis = False
     if entity is None:
-        # Only show log scale checkbox if no specific entity is selected (scatter plot mode)
-        log_y_axis = st.checkbox("Usar escala logarítmica para eje Y", value=False)
-
-        fig = px.scatter(
-            df.query('Entity == @groups'),
-            x='Year',
-            y='Number of articles',
-            size='Number of articles',
-            color='Entity',
-            log_y=log_y_axis,
-            hover_data={ # Enhanced hover data
-                'Entity': True,
-                'Year': True,
-                'Number of articles': ':,d' # Format number with comma and as integer
-            }
-        )
-        st.plotly_chart(fig, use_container_width=True) # ensure use_container_width
+        papers_groups_chart(comparison_groups(df, 'papers'), field)
     else:
         # Bar chart for a single selected entity
         entity_df = df[df['Entity'] == entity]
@@ -103,36 +141,93 @@ def annual_papers():
                      y='Number of articles',
                      title=f'Publicaciones anuales de {entity}')
         st.plotly_chart(fig, use_container_width=True) # ensure use_container_width
+        export_data(entity_df, 'publicaciones', f'{field}_{entity}')
 
-@st.cache_data
-def load_global_investment_data():
+
+@partial('Dispersión por grupos')
+def papers_groups_chart(df_groups, field):
     """
-    Loads and processes the global investment data in generative AI.
+    Displays the scatter plot comparing the default groups, with an option
+    for log scale on the Y-axis.
 
-    Reads data from the CSV file specified by CSV_INV, renames the investment column
-    to 'Investment', and scales its values to billions of USD.
+    Runs as a fragment: toggling the log scale only redraws this chart.
 
-    Returns:
-        pandas.DataFrame: Processed DataFrame with global investment data.
-                          Returns an empty DataFrame if the source file is not found or is empty.
+    Args:
+        df_groups (pandas.DataFrame): Publications of the entities in `comparison_groups`.
+        field (str): Research field of the data, used for the export file name.
     """
-    try:
-        path_csv = os.path.join(DATA_PATH, CSV_INV)
-        df = pd.read_csv(path_csv)
-    except FileNotFoundError:
-        st.error(f"Error: The data file for global investment ({CSV_INV}) was not found at {path_csv}.")
-        return pd.DataFrame()
+    log_y_axis = st.checkbox("Usar escala logarítmica para eje Y", value=False)
+    fig = px.scatter(
+        df_groups,
+        x='Year',
+        y='Number of articles',
+        size='Number of articles',
+        color='Entity',
+        log_y=log_y_axis,
+        hover_data={ # Enhanced hover data
+            'Entity': True,
+            'Year': True,
+            'Number of articles': ':,d' # Format number with comma and as integer
+        }
+    )
+    st.plotly_chart(fig, use_container_width=True) # ensure use_container_width
+    export_data(df_groups, 'publicaciones_grupos', field)
+
 
+GENERIC_TOP_ENTITIES = 10
+
+
+@partial('Serie del conjunto de datos')
+def dataset_chart(name):
+    """
+    Generic view of a registered dataset without hand-written views: a line
+    chart of the World and continent series plus the countries with the
+    highest last value (top GENERIC_TOP_ENTITIES), with a field selector for
+    multi-field datasets.
+
+    Args:
+        name (str): Registered dataset (see `utils.registry`).
+    """
+    spec = get_spec(name)
+    field = None
+    if spec.has_fields:
+        field = st.selectbox('Campo', options=load_fields(name), key=f'{name}_field')
+    df = load_table(name, field)
     if df.empty:
-        return df
+        st.warning(f"No hay datos disponibles para {spec.label}.")
+        return
 
-    # Rename column for consistency
-    df.rename(columns={
-        'Global investment in generative AI': 'Investment'
-    }, inplace=True)
-    # Scale unit to Billions USD
-    df['Investment'] = df['Investment'] / 1e9
-    return df
+    hierarchy = load_hierarchy()
+    countries = df[hierarchy.mask(df['Entity'], 'country')]
+    last = countries[countries['Year'] == countries['Year'].max()] if not countries.empty else countries
+    top = last.nlargest(GENERIC_TOP_ENTITIES, spec.value_name)['Entity']
+    shown = df[hierarchy.mask(df['Entity'], 'world', 'continent') | df['Entity'].isin(top).to_numpy()]
+
+    value_label = f"{spec.label} ({spec.unit})" if spec.unit else spec.label
+    fig = px.line(
+        shown,
+        x='Year',
+        y=spec.value_name,
+        color='Entity',
+        markers=True,
+        title=spec.title,
+        labels={spec.value_name: value_label, 'Year': 'Año', 'Entity': 'Entidad'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    export_data(shown, name, field or '')
+
+def load_global_investment_data():
+    """
+    Loads the global investment data in generative AI.
+
+    The 'global-investment' dataset of the registry: the investment column
+    renamed to 'Investment' and scaled to billions of USD.
+
+    Returns:
+        pandas.DataFrame: Columns 'Entity', 'Code', 'Year' and 'Investment'.
+                          Returns an empty DataFrame if the source file is not found or is empty.
+    """
+    return load_table('global-investment')
 
 def global_investment():
     """
@@ -159,216 +254,143 @@ def global_investment():
         yaxis_title="Inversión Mundial (miles de millones USD)"
     )
     st.plotly_chart(fig_line, use_container_width=True)
+    export_data(df, 'inversion_global_ia_generativa')
 
     st.subheader("Estadísticas Clave de Inversión")
     
-    unique_entities = df['Entity'].unique()
-    num_entities = len(unique_entities)
-    cols = st.columns(num_entities if num_entities > 0 else 1)
-    
-    col_index = 0
-    for entity_name in unique_entities:
-        entity_df = df[df['Entity'] == entity_name]
-        if not entity_df.empty:
-            total_investment = entity_df['Investment'].sum()
-            peak_investment_row = entity_df.loc[entity_df['Investment'].idxmax()]
-            peak_year = peak_investment_row['Year']
-            peak_value = peak_investment_row['Investment']
-
-            current_col = cols[col_index % num_entities]
-            with current_col:
-                st.markdown(f"#### {entity_name}")
-                st.metric(
-                    label="Inversión Total (Global)",
-                    value=f"${total_investment:,.2f}B USD"
-                )
-                st.metric(
-                    label=f"Pico de Inversión ({peak_year})",
-                    value=f"${peak_value:,.2f}B USD"
-                )
-            col_index += 1
+    summary = get_engine().entity_summary(load_query_table('global-investment'), 'Investment')
+    cols = st.columns(len(summary) if len(summary) > 0 else 1)
+
+    for col, row in zip(cols, summary.itertuples(index=False)):
+        with col:
+            st.markdown(f"#### {row.Entity}")
+            st.metric(
+                label="Inversión Total (Global)",
+                value=f"${row.Total:,.2f}B USD"
+            )
+            st.metric(
+                label=f"Pico de Inversión ({row.PeakYear})",
+                value=f"${row.PeakValue:,.2f}B USD"
+            )
 
-@st.cache_data
 def load_private_ai_investment_data():
     """
-    Loads and processes the total private AI investment data.
+    Loads the total private AI investment data.
 
-    Reads data from the CSV file specified by CSV_PRINV, renames the investment column
-    to 'Investment', and scales its values to billions of USD.
+    The 'private-investment' dataset of the registry: the investment column
+    renamed to 'Investment' and scaled to billions of USD.
 
     Returns:
-        pandas.DataFrame: Processed DataFrame with private AI investment data.
+        pandas.DataFrame: Columns 'Entity', 'Code', 'Year' and 'Investment'.
                           Returns an empty DataFrame if the source file is not found or is empty.
     """
-    try:
-        path_csv = os.path.join(DATA_PATH, CSV_PRINV)
-        df = pd.read_csv(path_csv)
-    except FileNotFoundError:
-        st.error(f"Error: The data file for private AI investment ({CSV_PRINV}) was not found at {path_csv}.")
-        return pd.DataFrame()
-
-    if df.empty:
-        return df
+    return load_table('private-investment')
 
-    # Rename column for consistency
-    df.rename(columns={
-        'Global total private investment in AI': 'Investment'
-    }, inplace=True)
-    # Scale unit to Billions USD
-    df['Investment'] = df['Investment'] / 1e9
-    return df
 
-@st.cache_data
-def load_annual_papers_map_data():
+def load_annual_papers_map_data(field=DEFAULT_FIELD):
     """
-    Loads and prepares data for the annual scholarly papers map.
+    Loads the data for the annual scholarly papers map.
 
-    This involves:
-    1. Loading the scholarly papers data (similar to `load_annual_papers_data`).
-    2. Converting entity names to ISO A3 country codes using `pycountry`.
-       Includes fuzzy matching and some hardcoded fallbacks for common mismatches.
-    3. Loading world geographic data (GeoJSON).
+    Args:
+        field (str): Research field, see `publication_fields`.
 
     Returns:
         tuple: A tuple containing:
-            - papers_df (pandas.DataFrame): DataFrame with papers data, including an 'iso_a3' column.
-                                            Returns an empty DataFrame if papers data is not found/empty.
+            - papers_df (pandas.DataFrame): Papers data of the field (`load_annual_papers_data`),
+                                            whose 'iso_a3' column the map joins on.
             - world_geo_df (geopandas.GeoDataFrame): GeoDataFrame with world map shapes.
                                                      Returns an empty GeoDataFrame if geo data is not found/empty.
     """
-    try:
-        papers_path = os.path.join(DATA_PATH, CSV_PUB)
-        papers_df = pd.read_csv(papers_path)
-    except FileNotFoundError:
-        st.error(f"Error: The data file for annual papers ({CSV_PUB}) was not found at {papers_path}.")
-        papers_df = pd.DataFrame()
-
-    if papers_df.empty:
-        try:
-            geo_path = os.path.join(DATA_PATH, WORLD_MAP)
-            world_geo_df = gpd.read_file(geo_path)
-        except FileNotFoundError:
-            st.error(f"Error: The geographic data file ({WORLD_MAP}) was not found at {geo_path}.")
-            world_geo_df = gpd.GeoDataFrame()
-        return papers_df, world_geo_df
-
-
-    papers_df = papers_df.query('not Entity.str.contains("CSET")')
-    papers_df.rename(columns={
-        'Number of articles - Field: All': 'Number of articles'
-    }, inplace=True)
-
-    # Add ISO A3 codes to papers_df
-    # Initialize column first
-    papers_df['iso_a3'] = None
-    unique_entities = papers_df['Entity'].unique()
-
-    for entity_name in unique_entities:
-        iso_code = None
-        try:
-            country = pycountry.countries.get(name=entity_name)
-            if country:
-                iso_code = country.alpha_3
-            else:
-                results = pycountry.countries.search_fuzzy(entity_name)
-                if results:
-                    iso_code = results[0].alpha_3
-        except LookupError:
-            # Try fuzzy search if exact match fails or if it's a common practice
-            try:
-                results = pycountry.countries.search_fuzzy(entity_name)
-                if results:
-                    iso_code = results[0].alpha_3
-            except Exception:
-                print(f"Warning: Fuzzy search failed for entity: {entity_name}")
-        except Exception as e:
-            print(f"Warning: Could not convert entity '{entity_name}' to ISO A3 code. Error: {e}")
-
-        if iso_code:
-            papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = iso_code
-        else:
-            # Optionally, handle specific known mismatches here if pycountry fails
-            if entity_name == "Russia":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "RUS"
-            elif entity_name == "Iran": # Common mismatch: "Iran, Islamic Republic of"
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "IRN"
-            elif entity_name == "South Korea": # Common mismatch: "Korea, Republic of"
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "KOR"
-            elif entity_name == "North Korea":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "PRK"
-            elif entity_name == "Vietnam":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "VNM"
-            elif entity_name == "Czech Republic": # Now Czechia
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "CZE"
-            elif entity_name == "Taiwan":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "TWN"
-            elif entity_name == "Moldova":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "MDA"
-            elif entity_name == "Bolivia":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "BOL"
-            elif entity_name == "Venezuela":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "VEN"
-            elif entity_name == "Tanzania":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "TZA"
-            elif entity_name == "Syria":
-                 papers_df.loc[papers_df['Entity'] == entity_name, 'iso_a3'] = "SYR"
-            else:
-                 print(f"Warning: Could not convert entity '{entity_name}' to ISO A3 code.")
+    return load_annual_papers_data(field), load_world_geo()
 
-    try:
-        geo_path = os.path.join(DATA_PATH, WORLD_MAP)
-        world_geo_df = gpd.read_file(geo_path)
-    except FileNotFoundError:
-        st.error(f"Error: The geographic data file ({WORLD_MAP}) was not found at {geo_path}.")
-        world_geo_df = gpd.GeoDataFrame() 
-    return papers_df, world_geo_df
-
-@st.cache_data
 def load_annual_investment_map_data():
     """
-    Loads and processes data for the annual private AI investment map.
-
-    Reads data from the CSV file specified by CSV_PRINV (private AI investment),
-    renames the investment column to 'Investment', and scales its values to
-    billions of USD (by dividing by 1e9). Also loads world geographic data.
+    Loads the data for the annual private AI investment map.
 
     Returns:
         tuple: A tuple containing:
-            - investment_df (pandas.DataFrame): DataFrame with private AI investment data, scaled to billions.
-                                                Returns an empty DataFrame if data is not found/empty.
+            - investment_df (pandas.DataFrame): Private AI investment data (`load_private_ai_investment_data`).
             - world_geo_df (geopandas.GeoDataFrame): GeoDataFrame with world map shapes.
                                                      Returns an empty GeoDataFrame if geo data is not found/empty.
     """
-    try:
-        investment_path = os.path.join(DATA_PATH, CSV_PRINV)
-        investment_df = pd.read_csv(investment_path)
-    except FileNotFoundError:
-        st.error(f"Error: The data file for private AI investment ({CSV_PRINV}) was not found at {investment_path}.")
-        investment_df = pd.DataFrame()
+    return load_private_ai_investment_data(), load_world_geo()
+
+
+@st.cache_resource(max_entries=2)
+def _world_geojson(fingerprint):
+    """Serializes the world map once per file version (`fingerprint` is the cache key)."""
+    world_geo = load_world_geo()
+    if world_geo.empty:
+        return json.dumps({'type': 'FeatureCollection', 'features': []})
+    return world_geo.to_json()
+
+
+def world_geojson():
+    """
+    GeoJSON text of the world map for the folium views.
+
+    Serialized from `load_world_geo` (the shared artifact when it is on), so
+    the GeoJSON file is parsed once. The string is immutable, so a single copy
+    is shared by every session and rerun instead of re-serializing the
+    GeoDataFrame each time a map is drawn.
+    """
+    return _world_geojson(file_fingerprint(os.path.join(DATA_PATH, WORLD_MAP)))
 
-    if not investment_df.empty:
-        investment_df.rename(columns={
-            'Global total private investment in AI': 'Investment'
-        }, inplace=True)
-        investment_df['Investment'] = investment_df['Investment'] / 1e9
 
-    try:
-        geo_path = os.path.join(DATA_PATH, WORLD_MAP)
-        world_geo_df = gpd.read_file(geo_path)
-    except FileNotFoundError:
-        st.error(f"Error: The geographic data file ({WORLD_MAP}) was not found at {geo_path}.")
-        world_geo_df = gpd.GeoDataFrame()
+def load_papers_country_year_totals(field=DEFAULT_FIELD):
+    """
+    Publications per (Year, iso_a3) of one research field, as drawn on the map.
 
-    return investment_df, world_geo_df
+    Regions and entities without an ISO A3 code are dropped (see `utils.datasets.map_rows`).
+
+    Returns:
+        pandas.DataFrame: Columns 'Year', 'iso_a3', 'Number of articles' and 'Entity'.
+    """
+    return load_map_rows('papers', field)
 
 
-def annual_papers_map_folium():
+def load_papers_choropleth_bins(method=MAP_BINNING, n_bins=MAP_BINS, field=DEFAULT_FIELD):
+    """
+    Publications map classes for every year of one research field (see
+    `utils.datasets.choropleth_bins`), keyed by ISO A3 code.
+    """
+    return load_choropleth_bins('papers', method, n_bins, field)
+
+
+def load_investment_choropleth_bins(method=MAP_BINNING, n_bins=MAP_BINS):
+    """
+    Private investment map classes for every year (see `utils.datasets.choropleth_bins`).
+
+    Each region's color is assigned to its constituent countries, keyed by
+    GeoJSON name (see `utils.regions.EntityHierarchy.map_names` and the
+    dataset's declared `regions`).
+    """
+    return load_choropleth_bins('private-investment', method, n_bins)
+
+
+def choropleth_style(color):
+    """Style for a choropleth feature given its precomputed color (None means no data)."""
+    if color is None:
+        return {'fillColor': 'lightgray', 'fillOpacity': 0.3, 'color': 'black', 'weight': 1, 'opacity': 0.2}
+    return {'fillColor': color, 'fillOpacity': 0.7, 'color': 'black', 'weight': 1, 'opacity': 0.2}
+
+
+@partial('Mapa de publicaciones')
+def annual_papers_map_folium(method=MAP_BINNING, field=DEFAULT_FIELD):
     """
     Displays a Folium map visualizing annual scholarly publications by country.
     Uses ISO A3 codes for joining publication data with geographic data.
     Includes a slider to select the year and tooltips for interaction.
+
+    Colors come from `load_papers_choropleth_bins`, so the legend is the same
+    for every year. Runs as a fragment: the year slider and clicks on the map
+    rerun only the map.
+
+    Args:
+        method (str): Binning method ('quantile', 'log' or 'jenks').
+        field (str): Research field, see `publication_fields`.
     """
-    df_papers_full, world_geo = load_annual_papers_map_data()
+    df_papers_full, world_geo = load_annual_papers_map_data(field)
 
     if df_papers_full is None or df_papers_full.empty: # Defensive check for None as well
         st.warning("Los datos de publicaciones anuales están vacíos o no se pudieron cargar.")
@@ -377,18 +399,14 @@ def annual_papers_map_folium():
         st.warning("Los datos geográficos del mundo están vacíos o no se pudieron cargar.")
         return
     
-    # Filtrar solo países (excluir regiones y entries without iso_a3)
-    regions_to_exclude = ['Europe', 'South America', 'North America', 'Asia', 'World']
-    df_countries = df_papers_full[
-        ~df_papers_full['Entity'].isin(regions_to_exclude) &
-        df_papers_full['iso_a3'].notna()
-    ].copy()
+    # Totales por país y año (solo países con iso_a3), ya separados por año
+    year_slices = load_year_slices('papers', field)
     
     # Selector de año
-    if df_countries.empty:
+    if not year_slices:
         st.warning("No country data available after ISO conversion and filtering.")
         return
-    years = sorted(df_countries['Year'].unique(), reverse=False)
+    years = sorted(year_slices)
     selected_year = st.slider(
         'Selecciona el año:',
         years[0],
@@ -396,11 +414,8 @@ def annual_papers_map_folium():
         years[-1]
     )
     
-    # Filtrar y agregar datos por año
-    df_year = df_countries[df_countries['Year'] == selected_year].copy()
-    df_aggregated = df_year.groupby('iso_a3').agg(
-        {'Number of articles': 'sum', 'Entity': 'first'}
-    ).reset_index()
+    # Datos del año seleccionado (ya agregados por iso_a3)
+    df_aggregated = year_slice(year_slices, selected_year)
     
     # Crear mapa base con configuración mejorada
     m = folium.Map(
@@ -412,24 +427,19 @@ def annual_papers_map_folium():
     )
     
     # Crear el mapa coroplético
+    geojson_data = world_geojson()
+    features = json.loads(geojson_data)['features']
     if not df_aggregated.empty:
-        geojson_data = world_geo.to_json()
-        
-        # Crear choropleth
-        choropleth = folium.Choropleth(
-            geo_data=geojson_data,
+        # Crear choropleth con las clases precalculadas (comunes a todos los años)
+        bins = load_papers_choropleth_bins(method, field=field)
+        year_colors = bins['by_year'].get(int(selected_year), {})
+        folium.GeoJson(
+            geojson_data,
             name="Publicaciones por país",
-            data=df_aggregated,
-            columns=['iso_a3', 'Number of articles'],
-            key_on="feature.properties.iso_a3",
-            fill_color="YlOrRd",
-            fill_opacity=0.7,
-            line_opacity=0.2,
-            legend_name=f"Número de publicaciones ({selected_year})",
-            nan_fill_color='lightgray',
-            nan_fill_opacity=0.3
-        )
-        choropleth.add_to(m)
+            style_function=lambda feature: choropleth_style(year_colors.get(feature['properties'].get('iso_a3')))
+        ).add_to(m)
+        if len(bins['breaks']) > 1:
+            binning.legend(bins['breaks'], bins['colors'], "Número de publicaciones").add_to(m)
         
         data_dict = {}
         for _, row in df_aggregated.iterrows():
@@ -489,12 +499,14 @@ def annual_papers_map_folium():
             )
         ).add_to(m)
 
-        for feature in json.loads(world_geo.to_json())['features']:
+        for feature in features:
             folium.GeoJson(
                 feature,
                 style_function=lambda x: {'fillColor': 'transparent', 'color': 'transparent', 'weight':0, 'fillOpacity':0},
                 tooltip=folium.Tooltip(create_tooltip(feature), sticky=True)
             ).add_to(m)
+        # Choropleth, tooltip layer and per-feature layers: three copies of the world GeoJSON
+        MAP_PAYLOAD_BYTES.observe(3 * len(geojson_data), map='papers')
 
     # Mostrar estadísticas resumidas
     total_countries_with_data = len(df_aggregated) if not df_aggregated.empty else 0
@@ -509,13 +521,14 @@ def annual_papers_map_folium():
     with col3:
         st.metric("Promedio por país", f"{avg_publications:.1f}")
     
-    # Mostrar mapa con configuración mejorada de tamaño
+    # Mostrar mapa con configuración mejorada de tamaño. La clave es fija: una sola
+    # instancia del componente (y de su estado) por vista, sea cual sea el año
     map_data = st_folium(
         m, 
         width=None,
         height=600,
         returned_objects=["last_object_clicked"],
-        key=f"map_{selected_year}"
+        key="papers_map"
     )
     
     # Mostrar información del país clickeado
@@ -523,7 +536,7 @@ def annual_papers_map_folium():
         clicked_iso_a3 = map_data['last_object_clicked']
         
         # Find the corresponding feature in world_geo to get its name for display
-        clicked_feature = next((f for f in json.loads(world_geo.to_json())['features'] if f['properties']['iso_a3'] == clicked_iso_a3), None)
+        clicked_feature = next((f for f in features if f['properties']['iso_a3'] == clicked_iso_a3), None)
         clicked_country_name_display = clicked_feature['properties']['name'] if clicked_feature else clicked_iso_a3
 
         tooltip_content = data_dict.get(clicked_iso_a3)
@@ -557,30 +570,22 @@ def annual_papers_map_folium():
         # Ensure columns are in a sensible order if 'iso_a3' is now included
         column_order=("Entity", "iso_a3", "Number of articles") if 'iso_a3' in top_countries.columns else ("Entity", "Number of articles")
     )
+    # Export the full yearly slice, not only the top 10
+    export_data(df_aggregated, 'publicaciones_por_pais', f'{field}_{selected_year}')
 
-def load_annual_investment_map_data():
-    """Loads and processes data for the annual investment map."""
-    investment_path = os.path.join(DATA_PATH, CSV_PRINV)
-    investment_df = pd.read_csv(investment_path)
-    investment_df.rename(columns={
-        'Global total private investment in AI': 'Investment'
-    }, inplace=True)
-    investment_df['Investment'] = investment_df['Investment'] / 1e9 # Corrected to 1e9 for Billions
-
-    try:
-        geo_path = os.path.join(DATA_PATH, WORLD_MAP)
-        world_geo_df = gpd.read_file(geo_path)
-    except FileNotFoundError:
-        st.error(f"Error: The geographic data file ({WORLD_MAP}) was not found at {geo_path}.")
-        world_geo_df = gpd.GeoDataFrame()
-
-    return investment_df, world_geo_df
-
-def annual_investment_map_folium():
+@partial('Mapa de inversión')
+def annual_investment_map_folium(method=MAP_BINNING):
     """
     Displays a Folium map visualizing annual private AI investment by major regions/countries.
     Maps aggregate regional data (e.g., "Europe") to constituent countries on the map.
     Includes a slider to select the year and tooltips for interaction.
+
+    Colors come from `load_investment_choropleth_bins`, so the legend is the
+    same for every year. Runs as a fragment: the year slider and clicks on the
+    map rerun only the map.
+
+    Args:
+        method (str): Binning method ('quantile', 'log' or 'jenks').
     """
     df_investment_full, world_geo = load_annual_investment_map_data()
 
@@ -591,9 +596,10 @@ def annual_investment_map_folium():
         st.warning("Los datos geográficos del mundo están vacíos o no se pudieron cargar.")
         return
     
-    # Filtrar entidades válidas (excluir World para el mapa)
-    valid_entities = ['China', 'Europe', 'United States']
-    df_filtered = df_investment_full[df_investment_full['Entity'].isin(valid_entities)].copy()
+    # Filtrar entidades con formas en el mapa (países y continentes, sin World)
+    hierarchy = load_hierarchy()
+    df_filtered = load_map_rows('private-investment')
+    year_slices = load_year_slices('private-investment')
     
     # Selector de año
     # Ensure df_filtered is not empty before trying to access 'Year'
@@ -609,7 +615,7 @@ def annual_investment_map_folium():
     )
     
     # Filtrar datos por año seleccionado
-    df_year = df_filtered[df_filtered['Year'] == selected_year].copy()
+    df_year = year_slice(year_slices, selected_year)
     
     # Crear mapa base
     m = folium.Map(
@@ -620,57 +626,25 @@ def annual_investment_map_folium():
         height='600px'
     )
     
-    # Mapeo de entidades a países/regiones en el GeoJSON
-    entity_to_countries = {
-        'United States': ['United States of America'],
-        'China': ['China'],
-        'Europe': [
-            'Germany', 'France', 'Italy', 'Spain', 'Poland', 'Romania', 'Netherlands',
-            'Belgium', 'Czech Rep.', 'Greece', 'Portugal', 'Sweden', 'Hungary',
-            'Austria', 'Belarus', 'Switzerland', 'Bulgaria', 'Serbia', 'Denmark',
-            'Finland', 'Slovakia', 'Norway', 'Ireland', 'Croatia', 'Bosnia and Herz.',
-            'Albania', 'Lithuania', 'Slovenia', 'Latvia', 'Estonia', 'Macedonia',
-            'Moldova', 'Luxembourg', 'Malta', 'Iceland', 'Montenegro', 'Cyprus',
-            'United Kingdom', 'Ukraine', 'Czechia'
-        ]
-    }
-    
-    # Crear DataFrame expandido para el mapa coroplético
-    df_expanded = []
-    for _, row in df_year.iterrows():
-        entity = row['Entity']
-        investment = row['Investment']
-        
-        if entity in entity_to_countries:
-            countries = entity_to_countries[entity]
-            for country in countries:
-                df_expanded.append({
-                    'Entity': country,
-                    'Investment': investment,
-                    'Original_Entity': entity
-                })
-    
-    df_map = pd.DataFrame(df_expanded)
+    # Crear DataFrame expandido para el mapa coroplético (una fila por forma del GeoJSON)
+    regions = get_spec('private-investment').regions
+    shapes = {entity: hierarchy.map_names(entity, regions) for entity in df_year['Entity'].unique()}
+    df_map = get_engine().expand_to_shapes(load_query_year('private-investment', selected_year), shapes, 'Investment')
     
     # Crear el mapa coroplético
     if not df_map.empty:
-        geojson_data = world_geo.to_json()
+        geojson_data = world_geojson()
         
-        # Crear choropleth
-        choropleth = folium.Choropleth(
-            geo_data=geojson_data,
+        # Crear choropleth con las clases precalculadas (comunes a todos los años)
+        bins = load_investment_choropleth_bins(method)
+        year_colors = bins['by_year'].get(int(selected_year), {})
+        folium.GeoJson(
+            geojson_data,
             name="Inversión en IA por región",
-            data=df_map,
-            columns=['Entity', 'Investment'],
-            key_on="feature.properties.name",
-            fill_color="YlOrRd",
-            fill_opacity=0.7,
-            line_opacity=0.2,
-            legend_name=f"Inversión en IA (miles de millones USD) - {selected_year}",
-            nan_fill_color='lightgray',
-            nan_fill_opacity=0.3
-        )
-        choropleth.add_to(m)
+            style_function=lambda feature: choropleth_style(year_colors.get(feature['properties'].get('name')))
+        ).add_to(m)
+        if len(bins['breaks']) > 1:
+            binning.legend(bins['breaks'], bins['colors'], "Inversión en IA (miles de millones USD)").add_to(m)
         
         # Crear diccionario para tooltips
         data_dict = {}
@@ -720,6 +694,8 @@ def annual_investment_map_folium():
                 )
             )
             country_geojson.add_to(m)
+        # Choropleth and per-feature tooltip layers: two copies of the world GeoJSON
+        MAP_PAYLOAD_BYTES.observe(2 * len(geojson_data), map='investment')
     
     # Mostrar estadísticas resumidas incluyendo World si está disponible
     df_world = df_investment_full[df_investment_full['Entity'] == 'World']
@@ -740,13 +716,13 @@ def annual_investment_map_folium():
         china_investment = df_year[df_year['Entity'] == 'China']['Investment'].iloc[0] if len(df_year[df_year['Entity'] == 'China']) > 0 else 0
         st.metric("China", f"${china_investment:,.1f}B")
     
-    # Mostrar mapa
+    # Mostrar mapa (clave fija: una sola instancia del componente por vista)
     map_data = st_folium(
         m, 
         width=None,
         height=600,
         returned_objects=["last_object_clicked"],
-        key=f"investment_map_{selected_year}"
+        key="investment_map"
     )
     
     # Mostrar información del país clickeado
@@ -778,6 +754,7 @@ def annual_investment_map_folium():
             showlegend=False
         )
         st.plotly_chart(fig_bar, use_container_width=True)
+        export_data(df_year, 'inversion_privada_por_region', selected_year)
     else:
         st.info(f"No hay datos de inversión por región para el año {selected_year} para mostrar en el gráfico de barras.")
     
@@ -798,6 +775,8 @@ def annual_investment_map_folium():
             },
             hide_index=True
         )
+        # Unrounded values, as in the source data
+        export_data(df_year, 'inversion_privada_detalle', selected_year)
     else:
         st.info(f"No hay datos detallados por región para el año {selected_year} para mostrar en la tabla.")
     
@@ -816,4 +795,5 @@ def annual_investment_map_folium():
             xaxis_title="Año",
             yaxis_title="Inversión (miles de millones USD)"
         )
-        st.plotly_chart(fig_line, use_container_width=True)
\ No newline at end of file
+        st.plotly_chart(fig_line, use_container_width=True)
+        export_data(df_filtered, 'inversion_privada_evolucion')
\ No newline at end of file
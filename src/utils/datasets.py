@@ -0,0 +1,571 @@
+"""
+Shared precompute pipeline of the registered datasets (`utils.registry`).
+
+Every dataset flows through the same stages, each one cached once per process:
+
+1. ingest: chunked CSV read with compact dtypes, CSET groupings dropped, value
+   columns melted into long format and scaled (`ingest`);
+2. ISO resolve: an ISO A3 code per country entity, resolved once per distinct
+   name and shared by all datasets (`resolve_iso`);
+3. cube: the long (Entity x Year [x Field]) table of the dataset (`load_cube`),
+   from which one field is sliced with plain dtypes (`load_table`);
+4. per-year artifacts: the rows drawn on the map (`load_map_rows`), split by
+   year (`load_year_slices`), and the choropleth classes computed over all
+   years (`load_choropleth_bins`);
+5. per-entity series: the table sorted by entity and year into contiguous
+   arrays, so one entity's series is a slice (`load_entity_series`).
+
+The world geometry is loaded once (`load_world_geo`) for every map. With
+`SHARED_ARTIFACTS` on, the cube, tables, map rows and world geometry are
+served from memory-mapped files shared by every worker (`utils.artifacts`). The
+dataset-specific loaders of `utils.data` are thin wrappers over these stages;
+a dataset without them gets the generic views (`utils.data.dataset_chart` and
+the static map). `benchmarks/bench_registry.py` measures what one more dataset
+costs.
+"""
+import functools
+import logging
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pycountry
+import streamlit as st
+
+from utils import binning
+from utils.artifacts import shared_artifacts
+from utils.config import DATA_PATH, WORLD_MAP, MAP_BINNING, MAP_BINS, PUB_CHUNK_ROWS
+from utils.engine import get_engine
+from utils.fingerprint import file_fingerprint
+from utils.metrics import cached_loader
+from utils.regions import entity_kind, hierarchy_fingerprint, load_hierarchy
+from utils.registry import get_spec, registry
+
+logger = logging.getLogger(__name__)
+
+ID_COLUMNS = ['Entity', 'Code', 'Year']
+
+# Datasets with hand-written views in `utils.data`; the rest use the generic ones
+CUSTOM_VIEWS = ('papers', 'global-investment', 'private-investment')
+
+# Known entity names that pycountry cannot resolve
+iso_fallbacks = {
+    'Russia': 'RUS',
+    'Iran': 'IRN', # Common mismatch: "Iran, Islamic Republic of"
+    'South Korea': 'KOR', # Common mismatch: "Korea, Republic of"
+    'North Korea': 'PRK',
+    'Vietnam': 'VNM',
+    'Czech Republic': 'CZE', # Now Czechia
+    'Taiwan': 'TWN',
+    'Moldova': 'MDA',
+    'Bolivia': 'BOL',
+    'Venezuela': 'VEN',
+    'Tanzania': 'TZA',
+    'Syria': 'SYR'
+}
+
+
+@functools.cache
+def resolve_iso_a3(entity_name):
+    """
+    Converts an entity name to its ISO A3 country code using `pycountry`.
+
+    Includes fuzzy matching and some hardcoded fallbacks for common mismatches.
+    Memoized per name: fuzzy matching is the slowest step of the pipeline and
+    the datasets share most of their entities.
+
+    Returns:
+        str: The ISO A3 code, or None for regions and unknown names.
+    """
+    iso_code = None
+    try:
+        country = pycountry.countries.get(name=entity_name)
+        if country:
+            iso_code = country.alpha_3
+        else:
+            results = pycountry.countries.search_fuzzy(entity_name)
+            if results:
+                iso_code = results[0].alpha_3
+    except LookupError:
+        # Try fuzzy search if exact match fails or if it's a common practice
+        try:
+            results = pycountry.countries.search_fuzzy(entity_name)
+            if results:
+                iso_code = results[0].alpha_3
+        except Exception:
+            logger.debug("Fuzzy search failed for entity: %s", entity_name)
+    except Exception as e:
+        logger.warning("Could not convert entity '%s' to ISO A3 code. Error: %s", entity_name, e)
+
+    if iso_code:
+        return iso_code
+    # Optionally, handle specific known mismatches here if pycountry fails
+    iso_code = iso_fallbacks.get(entity_name)
+    if iso_code is None:
+        logger.warning("Could not convert entity '%s' to ISO A3 code.", entity_name)
+    return iso_code
+
+
+def value_columns(spec):
+    """
+    Source columns holding the values of a dataset.
+
+    Returns:
+        tuple: (columns, fields). `fields` are the category names of a
+               `field_prefix` dataset (None otherwise).
+
+    Raises:
+        FileNotFoundError: If the CSV does not exist.
+    """
+    if not spec.has_fields:
+        return [spec.value_column], None
+    header = pd.read_csv(spec.path, nrows=0).columns
+    columns = [c for c in header if c.startswith(spec.field_prefix)]
+    return columns, [c[len(spec.field_prefix):] for c in columns]
+
+
+def ingest(spec, chunk_rows=PUB_CHUNK_ROWS):
+    """
+    Reads a dataset into long format.
+
+    The CSV is read in chunks of `chunk_rows` rows with compact dtypes, the
+    groupings that are neither countries nor continents/World are dropped
+    (the CSET entries, see `utils.regions.entity_kind`) and each chunk is
+    melted right away, so a wide multi-field table is never held at once.
+
+    Returns:
+        pandas.DataFrame: Columns 'Entity' (categorical), 'Code', 'Year',
+                          'Field' (categorical, in file order; only for
+                          `field_prefix` datasets) and `spec.value_name`.
+                          Empty if the file has no rows.
+
+    Raises:
+        FileNotFoundError: If the CSV does not exist.
+    """
+    columns, fields = value_columns(spec)
+    value_dtype = 'UInt32' if spec.integer else 'float64'
+    reader = pd.read_csv(
+        spec.path,
+        usecols=ID_COLUMNS + columns,
+        dtype={'Year': 'int16', **{c: value_dtype for c in columns}},
+        chunksize=chunk_rows
+    )
+
+    chunks = []
+    for chunk in reader:
+        entities = chunk.drop_duplicates('Entity')
+        kinds = {name: entity_kind(name, code) for name, code in zip(entities['Entity'], entities['Code'])}
+        chunk = chunk[chunk['Entity'].map(kinds) != 'group']
+        if fields is None:
+            chunk = chunk.rename(columns={spec.value_column: spec.value_name})
+        else:
+            chunk = chunk.melt(
+                id_vars=ID_COLUMNS,
+                value_vars=columns,
+                var_name='Field',
+                value_name=spec.value_name
+            )
+            chunk['Field'] = pd.Categorical(chunk['Field'], categories=columns).rename_categories(fields)
+        chunks.append(chunk.dropna(subset=[spec.value_name]))
+
+    if not chunks:
+        return pd.DataFrame()
+
+    df = pd.concat(chunks, ignore_index=True)
+    df['Entity'] = df['Entity'].astype('category')
+    df[spec.value_name] = df[spec.value_name].astype('int32' if spec.integer else 'float64')
+    if spec.divide_by:
+        df[spec.value_name] = df[spec.value_name] / spec.divide_by
+    return df
+
+
+def resolve_iso(df):
+    """
+    Adds the 'iso_a3' column (None for entities without a code) to a cube.
+
+    Codes are resolved per category of 'Entity' and gathered by category code,
+    so the cost depends on the number of distinct entities, not rows. World
+    and the continents are aggregates (`utils.regions.entity_kind`) and are
+    not looked up.
+    """
+    categories = df['Entity'].cat.categories
+    codes = df.drop_duplicates('Entity').set_index('Entity')['Code']
+    table = np.array(
+        [resolve_iso_a3(name) if entity_kind(name, codes.get(name)) == 'country' else None for name in categories]
+        + [None],
+        dtype=object
+    )
+    df['iso_a3'] = table[df['Entity'].cat.codes.to_numpy()]  # Code -1 (missing) hits the trailing None
+    return df
+
+
+def build_cube(spec):
+    """Ingests a dataset and, for country datasets, resolves its ISO codes."""
+    df = ingest(spec)
+    if not df.empty and spec.entities == 'countries':
+        df = resolve_iso(df)
+    return df
+
+
+def slice_field(spec, cube, field=None):
+    """
+    One field of a cube as a flat table with plain dtypes.
+
+    Returns:
+        pandas.DataFrame: The cube's columns without 'Field'; 'Entity' as str,
+                          'Year' and integer values as int64.
+    """
+    if cube.empty:
+        return cube
+    if spec.has_fields:
+        cube = cube[cube['Field'] == field].drop(columns='Field')
+    dtypes = {'Entity': str, 'Year': 'int64'}
+    if spec.integer:
+        dtypes[spec.value_name] = 'int64'
+    return cube.astype(dtypes).reset_index(drop=True)
+
+
+class EntitySeries:
+    """
+    Per-entity time series of one table, split once and stored contiguously.
+
+    Rows are sorted by (Entity, Year) into two flat arrays; each entity owns a
+    [start, stop) range of them, so reading a series is two array slices (views,
+    no copy) instead of a boolean filter over the whole table.
+
+    Args:
+        table (pandas.DataFrame): Long table with 'Entity', 'Year' and `value_col`.
+        value_col (str): Value column.
+
+    Attributes:
+        entities (list): Entity names, sorted.
+        years (numpy.ndarray): Years of every series, back to back (int32).
+        values (numpy.ndarray): Matching values (float64).
+    """
+
+    def __init__(self, table, value_col):
+        ordered = table.sort_values(['Entity', 'Year'], kind='stable')
+        self.years = np.ascontiguousarray(ordered['Year'].to_numpy(dtype='int32'))
+        self.values = np.ascontiguousarray(ordered[value_col].to_numpy(dtype='float64'))
+        # Shared by every session: views handed out must not be written to
+        self.years.flags.writeable = self.values.flags.writeable = False
+        names = ordered['Entity'].to_numpy()
+        bounds = np.flatnonzero(names[1:] != names[:-1]) + 1 if len(names) else np.array([], dtype=int)
+        starts = np.concatenate(([0], bounds)) if len(names) else bounds
+        stops = np.append(starts[1:], len(names))
+        self.entities = [str(names[i]) for i in starts]
+        self._ranges = {name: (int(a), int(b)) for name, a, b in zip(self.entities, starts, stops)}
+
+    def __contains__(self, entity):
+        return entity in self._ranges
+
+    def __len__(self):
+        return len(self.entities)
+
+    def get(self, entity):
+        """
+        Series of one entity.
+
+        Returns:
+            tuple: (years, values) array views, sorted by year.
+
+        Raises:
+            KeyError: If the entity has no rows.
+        """
+        start, stop = self._ranges[entity]
+        return self.years[start:stop], self.values[start:stop]
+
+    def year_range(self):
+        """(first, last) year over all series."""
+        return int(self.years.min()), int(self.years.max())
+
+
+def map_rows(spec, table, hierarchy, source=None):
+    """
+    Rows of a dataset that are drawn on its map, for every year.
+
+    `source` is `table` in the DataFrame engine's native format (see
+    `load_query_table`), to run the aggregation on; `table` itself by default.
+
+    Returns:
+        pandas.DataFrame: For 'iso_a3' maps, one row per (Year, iso_a3) over the
+                          countries with a code ('Entity' keeps the first name);
+                          for 'name' maps, the country and continent rows (their
+                          shapes are looked up with `hierarchy.map_names`,
+                          preferring the dataset's declared `regions`).
+    """
+    if table.empty:
+        return table
+    if spec.map_join == 'iso_a3':
+        mask = hierarchy.mask(table['Entity'], 'country')
+        return get_engine().country_year_totals(table if source is None else source, mask, spec.value_name)
+    return table[hierarchy.mask(table['Entity'], 'country', 'continent')]
+
+
+def choropleth_bins(spec, rows, hierarchy, method=MAP_BINNING, n_bins=MAP_BINS):
+    """
+    Choropleth classes of a dataset over all years.
+
+    Breaks are computed once over every (entity, year) value, so colors and
+    legend are comparable across years. Region colors are assigned to all
+    their constituent shapes.
+
+    Returns:
+        dict: 'breaks' (list of edges), 'colors' (one hex color per class) and
+              'by_year' ({year: {join key: color}}). Empty lists/dicts if there is no data.
+    """
+    if rows.empty:
+        return {'breaks': [], 'colors': [], 'by_year': {}}
+
+    breaks = binning.compute_breaks(rows[spec.value_name], method, n_bins)
+    colors = binning.bin_palette(len(breaks) - 1)
+    key = 'iso_a3' if spec.map_join == 'iso_a3' else 'Entity'
+    by_year = {}
+    for year, group in rows.groupby('Year'):
+        year_colors = binning.color_lookup(group[key], group[spec.value_name], breaks, colors)
+        if spec.map_join == 'name':
+            year_colors = {
+                shape: color
+                for region, color in year_colors.items()
+                for shape in hierarchy.map_names(region, spec.regions)
+            }
+        by_year[int(year)] = year_colors
+    return {'breaks': breaks.tolist(), 'colors': colors, 'by_year': by_year}
+
+
+# Every cached stage takes the fingerprint of the files it is built from as its
+# last argument (the cache key), so a changed CSV invalidates all of its stages
+# together; the public wrappers compute it.
+
+def _map_version(name):
+    """Fingerprint of a dataset's map stages: its CSV plus the hierarchy sources."""
+    return f"{get_spec(name).fingerprint()}-{hierarchy_fingerprint()}"
+
+
+@cached_loader
+def _load_fields(name, fingerprint):
+    spec = get_spec(name)
+    try:
+        fields = value_columns(spec)[1]
+    except FileNotFoundError:
+        return [None]
+    return fields or [None]
+
+
+def load_fields(name):
+    """Fields of a `field_prefix` dataset in file order (the OWID export lists 'All' first), or [None]."""
+    return _load_fields(name, get_spec(name).fingerprint())
+
+
+def _field(name, field):
+    """Normalizes `field` (None means the first field), so each slice is cached once."""
+    if not get_spec(name).has_fields:
+        return None
+    return field if field is not None else load_fields(name)[0]
+
+
+@shared_artifacts({'cube_{name}': None})
+@cached_loader
+def _load_cube(name, fingerprint):
+    spec = get_spec(name)
+    try:
+        return build_cube(spec)
+    except FileNotFoundError:
+        st.error(f"Error: The data file for {spec.label} ({spec.csv}) was not found at {spec.path}.")
+        return pd.DataFrame()
+
+
+def load_cube(name):
+    """
+    Cached cube of a registered dataset, see `build_cube`.
+
+    Returns an empty DataFrame (and shows an error) if the source file is not found.
+    """
+    return _load_cube(name, get_spec(name).fingerprint())
+
+
+@shared_artifacts({'table_{name}_{field}': None})
+@cached_loader
+def _load_table(name, field, fingerprint):
+    return slice_field(get_spec(name), _load_cube(name, fingerprint), field)
+
+
+def load_table(name, field=None):
+    """
+    One field of a registered dataset as a flat table, see `slice_field`.
+
+    Args:
+        name (str): Registered dataset.
+        field (str): Field of a `field_prefix` dataset (default: the first one).
+    """
+    return _load_table(name, _field(name, field), get_spec(name).fingerprint())
+
+
+@st.cache_resource(max_entries=16)
+def _load_native_table(name, field, fingerprint, engine):
+    """Table converted for `engine` once per dataset version (`fingerprint` is the cache key)."""
+    return get_engine(engine).native(_load_table(name, field, fingerprint))
+
+
+def load_query_table(name, field=None):
+    """
+    One field of a dataset in the native format of the DataFrame engine
+    (`utils.engine`), to build queries on.
+
+    With the pandas engine this is `load_table`. With Polars the table is
+    converted once per dataset version and shared read-only by every session.
+    """
+    engine = get_engine()
+    if engine.name == 'pandas':
+        return load_table(name, field)
+    return _load_native_table(name, _field(name, field), get_spec(name).fingerprint(), engine.name)
+
+
+@shared_artifacts({'map_rows_{name}_{field}': None})
+@cached_loader
+def _load_map_rows(name, field, fingerprint):
+    return map_rows(get_spec(name), load_table(name, field), load_hierarchy(), load_query_table(name, field))
+
+
+def load_map_rows(name, field=None):
+    """Cached `map_rows` of one field of a dataset with a map."""
+    return _load_map_rows(name, _field(name, field), _map_version(name))
+
+
+@cached_loader
+def _load_year_slices(name, field, fingerprint):
+    return {int(year): group for year, group in load_map_rows(name, field).groupby('Year')}
+
+
+def load_year_slices(name, field=None):
+    """
+    Map rows of a dataset split by year, so a map view takes its year with one
+    lookup instead of filtering every row on each rerun.
+
+    Returns:
+        dict: Year -> DataFrame with the columns of `load_map_rows`. Only
+              years with data have a key, see `year_slice`.
+    """
+    return _load_year_slices(name, _field(name, field), _map_version(name))
+
+
+@st.cache_resource(max_entries=16)
+def _load_native_year_slices(name, field, fingerprint, engine):
+    """Year slices converted for `engine` once per map version (`fingerprint` is the cache key)."""
+    native = get_engine(engine).native
+    return {year: native(rows) for year, rows in _load_year_slices(name, field, fingerprint).items()}
+
+
+def load_query_year(name, year, field=None):
+    """
+    Map rows of one year (see `year_slice`) in the native format of the
+    DataFrame engine, like `load_query_table`.
+    """
+    engine = get_engine()
+    if engine.name == 'pandas':
+        return year_slice(load_year_slices(name, field), year)
+    slices = _load_native_year_slices(name, _field(name, field), _map_version(name), engine.name)
+    return year_slice(slices, year)
+
+
+def year_slice(year_slices, year):
+    """
+    Rows of one year of `load_year_slices`.
+
+    Returns:
+        pandas.DataFrame: The year's rows, or an empty frame with the same
+                          columns for a year without data (a gap in the range
+                          the year slider offers).
+    """
+    rows = year_slices.get(int(year))
+    if rows is None:
+        return next(iter(year_slices.values())).head(0)
+    return rows
+
+
+@cached_loader
+def _load_choropleth_bins(name, method, n_bins, field, fingerprint):
+    rows = load_map_rows(name, field)
+    return choropleth_bins(get_spec(name), rows, load_hierarchy(), method, n_bins)
+
+
+def load_choropleth_bins(name, method=MAP_BINNING, n_bins=MAP_BINS, field=None):
+    """Cached `choropleth_bins` of one field of a dataset with a map."""
+    return _load_choropleth_bins(name, method, n_bins, _field(name, field), _map_version(name))
+
+
+@cached_loader
+def _load_rollup_check(name, field, fingerprint):
+    return load_hierarchy().check_rollups(load_table(name, field), get_spec(name).value_name)
+
+
+def load_rollup_check(name, field=None):
+    """
+    Cached `EntityHierarchy.check_rollups` of one field of a dataset: its
+    World and continent rows against the sum of their countries. Recomputed
+    only when the dataset or the hierarchy sources change.
+    """
+    return _load_rollup_check(name, _field(name, field), _map_version(name))
+
+
+@st.cache_resource(max_entries=16)
+def _load_entity_series(name, field, fingerprint):
+    """Series store of one field, once per dataset version (`fingerprint` is the cache key)."""
+    return EntitySeries(_load_table(name, field, fingerprint), get_spec(name).value_name)
+
+
+def load_entity_series(name, field=None):
+    """
+    Per-entity series of one field of a registered dataset (see `EntitySeries`).
+
+    The store is shared read-only by every session instead of being copied
+    out of `st.cache_data` on each call.
+    """
+    return _load_entity_series(name, _field(name, field), get_spec(name).fingerprint())
+
+
+@shared_artifacts({'world_geo': None})
+@cached_loader
+def _load_world_geo(fingerprint):
+    geo_path = os.path.join(DATA_PATH, WORLD_MAP)
+    try:
+        return gpd.read_file(geo_path)
+    except FileNotFoundError:
+        st.error(f"Error: The geographic data file ({WORLD_MAP}) was not found at {geo_path}.")
+        return gpd.GeoDataFrame()
+
+
+def load_world_geo():
+    """
+    World map shapes shared by every map.
+
+    Returns:
+        geopandas.GeoDataFrame: The world GeoJSON, empty (with an error shown) if it is not found.
+    """
+    return _load_world_geo(file_fingerprint(os.path.join(DATA_PATH, WORLD_MAP)))
+
+
+def build_artifacts(name=None):
+    """
+    (Re)writes the shared artifacts of a dataset: its cube and, for every
+    field, its table and map rows. Without `name`, the world geometry.
+    """
+    if name is None:
+        _load_world_geo.build(file_fingerprint(os.path.join(DATA_PATH, WORLD_MAP)))
+        return
+    spec = get_spec(name)
+    fingerprint = spec.fingerprint()
+    _load_cube.build(name, fingerprint)
+    for field in load_fields(name):
+        _load_table.build(name, field, fingerprint)
+        if spec.map_join is not None:
+            _load_map_rows.build(name, field, _map_version(name))
+
+
+def generic_datasets(with_map=False):
+    """Registered datasets without hand-written views (only those with a map if `with_map`)."""
+    return [
+        spec for name, spec in registry().items()
+        if name not in CUSTOM_VIEWS and (spec.map_join is not None or not with_map)
+    ]
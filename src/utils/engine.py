@@ -0,0 +1,195 @@
+"""
+Query layer of the aggregation views.
+
+The filters, group-bys, joins and reshapes behind the maps and the investment
+views go through a DataFrame engine selected with `DATAFRAME_ENGINE`:
+
+- 'pandas' (default): eager pandas.
+- 'polars': each query is built as a Polars lazy plan, so filters and
+  projections are pushed down and the whole plan runs multi-threaded in one
+  `collect`.
+
+Queries start from frames in the engine's native format (`native`): the
+pipeline keeps one converted copy of each table per dataset version
+(`utils.datasets.load_query_table`), so the Polars engine builds its plans
+on a cached `polars.DataFrame` instead of converting its input on every call.
+Results are pandas DataFrames: Polars results are converted (through Arrow)
+only when handed back to the plotting code. `benchmarks/bench_engines.py`
+compares their throughput on scaled-up synthetic data.
+"""
+import functools
+import logging
+
+import pandas as pd
+
+from utils.config import DATAFRAME_ENGINE
+
+logger = logging.getLogger(__name__)
+
+DATAFRAME_ENGINES = ('pandas', 'polars')
+
+
+class PandasEngine:
+    """Eager pandas implementation of the queries."""
+
+    name = 'pandas'
+
+    def native(self, df):
+        """Input frame for the queries: pandas frames are used as they are."""
+        return df
+
+    def country_year_totals(self, df, mask, value_col):
+        """
+        Sums `value_col` per (Year, iso_a3) over the rows selected by `mask`
+        that have an ISO code, keeping the first entity name of each group.
+
+        Returns:
+            pandas.DataFrame: Columns 'Year', 'iso_a3', `value_col` and 'Entity',
+                              sorted by year and code.
+        """
+        selected = df[mask & df['iso_a3'].notna().to_numpy()]
+        return selected.groupby(['Year', 'iso_a3'], as_index=False).agg({value_col: 'sum', 'Entity': 'first'})
+
+    def entity_summary(self, df, value_col):
+        """
+        Total and peak of `value_col` per entity, in order of first appearance.
+
+        Returns:
+            pandas.DataFrame: Columns 'Entity', 'Total', 'PeakYear' and 'PeakValue'.
+        """
+        grouped = df.groupby('Entity', sort=False)[value_col]
+        peaks = df.loc[grouped.idxmax(), ['Entity', 'Year', value_col]]
+        return pd.DataFrame({
+            'Entity': peaks['Entity'].to_numpy(),
+            'Total': grouped.sum().to_numpy(),
+            'PeakYear': peaks['Year'].to_numpy(),
+            'PeakValue': peaks[value_col].to_numpy(),
+        })
+
+    def compare_entity(self, frames, entity, value_col, var_name, value_name):
+        """
+        Puts the series of one entity from several datasets side by side.
+
+        Args:
+            frames (dict): Series label -> DataFrame with 'Entity', 'Year' and `value_col`.
+            entity (str): Entity to compare (e.g. 'World').
+            value_col (str): Value column of every frame.
+            var_name (str): Name of the label column of the long result.
+            value_name (str): Name of the value column of the long result.
+
+        Returns:
+            tuple: (wide, long) DataFrames. `wide` has 'Year' plus one column per
+                   label (outer join on the year); `long` is its melted form
+                   without missing values.
+        """
+        wide = None
+        for label, df in frames.items():
+            series = df.loc[df['Entity'] == entity, ['Year', value_col]].rename(columns={value_col: label})
+            wide = series if wide is None else wide.merge(series, on='Year', how='outer')
+        wide = wide.sort_values('Year', ignore_index=True)
+        long = wide.melt(id_vars=['Year'], value_vars=list(frames), var_name=var_name, value_name=value_name)
+        return wide, long.dropna(subset=[value_name]).reset_index(drop=True)
+
+    def expand_to_shapes(self, df, shapes, value_col):
+        """
+        Repeats each entity's row once per map shape it covers.
+
+        Args:
+            df (pandas.DataFrame): Rows with 'Entity' and `value_col`.
+            shapes (dict): Entity -> iterable of GeoJSON names.
+
+        Returns:
+            pandas.DataFrame: Columns 'Entity' (GeoJSON name), `value_col` and
+                              'Original_Entity'.
+        """
+        mapping = shape_mapping(shapes)
+        expanded = df[['Entity', value_col]].merge(mapping, left_on='Entity', right_on='Original_Entity')
+        return expanded[['Shape', value_col, 'Original_Entity']].rename(columns={'Shape': 'Entity'})
+
+
+class PolarsEngine:
+    """Polars lazy implementation of the queries; see `PandasEngine` for the contracts."""
+
+    name = 'polars'
+
+    def __init__(self):
+        import polars as pl
+        self.pl = pl
+
+    def native(self, df):
+        """Converts a pandas frame to a `polars.DataFrame` to build the queries on."""
+        return self.pl.from_pandas(df)
+
+    def _lazy(self, df):
+        # Native frames are only wrapped; pandas input is converted on each call
+        return (df if isinstance(df, self.pl.DataFrame) else self.native(df)).lazy()
+
+    def country_year_totals(self, df, mask, value_col):
+        pl = self.pl
+        return (self._lazy(df[['Year', 'iso_a3', 'Entity', value_col]])
+                .filter(pl.Series(mask) & pl.col('iso_a3').is_not_null())
+                .group_by(['Year', 'iso_a3'])
+                .agg(pl.col(value_col).sum(), pl.col('Entity').first())
+                .sort(['Year', 'iso_a3'])
+                .collect()
+                .to_pandas())
+
+    def entity_summary(self, df, value_col):
+        pl = self.pl
+        return (self._lazy(df[['Entity', 'Year', value_col]])
+                .group_by('Entity', maintain_order=True)
+                .agg(
+                    pl.col(value_col).sum().alias('Total'),
+                    pl.col('Year').get(pl.col(value_col).arg_max()).alias('PeakYear'),
+                    pl.col(value_col).max().alias('PeakValue'),
+                )
+                .collect()
+                .to_pandas())
+
+    def compare_entity(self, frames, entity, value_col, var_name, value_name):
+        pl = self.pl
+        wide = None
+        for label, df in frames.items():
+            series = (self._lazy(df[['Entity', 'Year', value_col]])
+                      .filter(pl.col('Entity') == entity)
+                      .select('Year', pl.col(value_col).alias(label)))
+            wide = series if wide is None else wide.join(series, on='Year', how='full', coalesce=True)
+        wide = wide.sort('Year')
+        long = (wide.unpivot(index='Year', on=list(frames), variable_name=var_name, value_name=value_name)
+                .drop_nulls(value_name))
+        wide, long = pl.collect_all([wide, long])  # One pass over the shared plan
+        return wide.to_pandas(), long.to_pandas()
+
+    def expand_to_shapes(self, df, shapes, value_col):
+        pl = self.pl
+        return (self._lazy(df[['Entity', value_col]])
+                .join(pl.from_pandas(shape_mapping(shapes)).lazy(), left_on='Entity', right_on='Original_Entity')
+                .select(pl.col('Shape').alias('Entity'), value_col, pl.col('Entity').alias('Original_Entity'))
+                .collect()
+                .to_pandas())
+
+
+def shape_mapping(shapes):
+    """Entity -> shapes dict as a two-column ('Original_Entity', 'Shape') table."""
+    pairs = [(entity, shape) for entity, names in shapes.items() for shape in names]
+    return pd.DataFrame(pairs, columns=['Original_Entity', 'Shape'])
+
+
+@functools.cache
+def get_engine(name=DATAFRAME_ENGINE):
+    """
+    Returns the DataFrame engine `name` ('pandas' or 'polars').
+
+    Falls back to pandas (with a warning) if Polars is selected but not installed.
+
+    Raises:
+        ValueError: If `name` is not one of DATAFRAME_ENGINES.
+    """
+    if name not in DATAFRAME_ENGINES:
+        raise ValueError(f"Unknown DataFrame engine '{name}'. Expected one of {DATAFRAME_ENGINES}.")
+    if name == 'polars':
+        try:
+            return PolarsEngine()
+        except ImportError:
+            logger.warning("Polars is not installed, using the pandas DataFrame engine.")
+    return PandasEngine()
@@ -0,0 +1,108 @@
+"""
+Bulk data export for charts and tables.
+
+Every view can offer the full slice behind it as CSV, Parquet or Arrow. The
+serialized bytes are produced only after the user picks a format, and are
+memoized per (view, filter, format, content digest), so normal reruns pay
+nothing for exports and a data update never serves stale bytes.
+"""
+import hashlib
+import io
+
+import pandas as pd
+import streamlit as st
+
+from utils.reruns import partial
+
+EXPORT_FORMATS = {
+    'CSV': 'csv',
+    'Parquet': 'parquet',
+    'Arrow (IPC)': 'arrow'
+}
+
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file'
+}
+
+
+def to_bytes(df, fmt):
+    """
+    Serializes a DataFrame.
+
+    Args:
+        df (pandas.DataFrame): Data to export.
+        fmt (str): 'csv', 'parquet' or 'arrow' (Arrow IPC file format).
+
+    Returns:
+        bytes: The serialized data.
+    """
+    if fmt == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    buffer = io.BytesIO()
+    if fmt == 'parquet':
+        df.to_parquet(buffer, index=False)
+    elif fmt == 'arrow':
+        df.reset_index(drop=True).to_feather(buffer)
+    else:
+        raise ValueError(f"Unsupported export format '{fmt}'. Expected one of {list(MIME_TYPES)}.")
+    return buffer.getvalue()
+
+
+def content_digest(df):
+    """
+    Short digest of a DataFrame's columns and values.
+
+    Uses pandas' vectorized row hashes, so it costs one pass over the slice
+    instead of pickling it the way `st.cache_data` hashes arguments.
+    """
+    digest = hashlib.sha1(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def serialize_view(view, filter_key, fmt, digest, _df):
+    """
+    Memoized `to_bytes` keyed by (view, filter, format, digest).
+
+    `_df` is not hashed by Streamlit (leading underscore); `digest`
+    (`content_digest`) stands in for it, so new data gets new bytes.
+    """
+    return to_bytes(_df, fmt)
+
+
+@partial('Exportación')
+def export_data(df, view, filter_key='', file_name=None):
+    """
+    Renders an export popover for the data behind a chart or table.
+
+    Nothing is serialized until a format is selected. Runs as a fragment, so
+    choosing a format or downloading does not rerun the view around it.
+
+    Args:
+        df (pandas.DataFrame): Full slice shown by the view.
+        view (str): Unique view name, also used for widget keys.
+        filter_key (str): Current filter of the view (e.g. the selected year).
+        file_name (str): Base file name, defaults to `view` plus the filter.
+    """
+    with st.popover('Exportar datos', icon=':material/download:'):
+        label = st.selectbox(
+            'Formato',
+            options=EXPORT_FORMATS,
+            index=None,
+            placeholder='Selecciona un formato...',
+            key=f"export_{view}_{filter_key}"
+        )
+        if label is None:
+            return
+        fmt = EXPORT_FORMATS[label]
+        base_name = file_name or '_'.join(part for part in (view, str(filter_key)) if part)
+        st.download_button(
+            f'Descargar {label}',
+            data=serialize_view(view, str(filter_key), fmt, content_digest(df), df),
+            file_name=f"{base_name}.{fmt}",
+            mime=MIME_TYPES[fmt],
+            key=f"download_{view}_{filter_key}"
+        )
@@ -0,0 +1,46 @@
+"""
+Content fingerprints for source files.
+
+A fingerprint identifies one version of a dataset: it changes whenever any of
+its files change and is stable across processes and restarts, so it can be
+used as a cache key or as an HTTP ETag.
+"""
+import hashlib
+import os
+
+# (path, mtime_ns, size) -> sha1 hexdigest; avoids re-hashing unchanged files
+_digests = {}
+
+
+def file_digest(path):
+    """Returns the SHA-1 of a file's contents, memoized on (path, mtime, size)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        _digests[key] = digest
+    return digest
+
+
+def file_fingerprint(*paths):
+    """
+    Combined fingerprint of one or more files.
+
+    Missing files contribute a fixed marker instead of raising, so callers can
+    still report "no data" consistently.
+
+    Returns:
+        str: 16 hex characters.
+    """
+    sha = hashlib.sha1()
+    for path in paths:
+        try:
+            sha.update(file_digest(path).encode())
+        except FileNotFoundError:
+            sha.update(f"missing:{path}".encode())
+    return sha.hexdigest()[:16]
@@ -0,0 +1,214 @@
+"""
+Process metrics in the Prometheus text exposition format.
+
+The dashboard records a few counters and histograms as it runs, and the data
+API (`utils.api`) serves them at `GET /metrics`, so a local scrape is just:
+
+    curl http://127.0.0.1:8600/metrics
+
+Metrics:
+    vd_rerun_duration_seconds{page, fragment}
+        Full page reruns (fragment="") and fragment reruns.
+    vd_loader_duration_seconds{loader, dataset}
+        Calls to the cached pipeline stages of `utils.datasets`, hits included.
+        `dataset` is the registered dataset the call is for ("" for loaders
+        not tied to one, e.g. the world geometry).
+    vd_cache_requests_total{loader, dataset, result}
+        `st.cache_data` hits and misses per loader and dataset.
+    vd_map_payload_bytes{map}
+        GeoJSON bytes embedded in each folium map sent to the browser.
+    vd_active_sessions, vd_process_resident_memory_bytes
+        Read when scraped.
+
+Recording is a lock plus a few additions per event, and gauges cost nothing
+until a scrape, so the hot paths only pay for what they measure.
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+
+import streamlit as st
+
+SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = tuple(2 ** k for k in range(16, 27))  # 64 KiB .. 64 MiB
+
+
+def _labels(names, values):
+    """Renders a label set as `{a="x",b="y"}` (empty string if there are no labels)."""
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds, as Prometheus expects."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [counts per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][index] += 1
+            counts[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        names = self.labels + ('le',)
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, key + (_number(bound),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {cumulative}"
+
+
+class Gauge:
+    """Value computed by `read` at scrape time (None omits the sample)."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, read):
+        self.name, self.help, self.read = name, help, read
+
+    def samples(self):
+        value = self.read()
+        if value is not None:
+            yield f"{self.name} {_number(value)}"
+
+
+def _active_sessions():
+    """Sessions connected to this Streamlit server, or None outside of one (e.g. a standalone API)."""
+    from streamlit.runtime import Runtime
+    if not Runtime.exists():
+        return None
+    # The session manager has no public accessor on Runtime
+    return Runtime.instance()._session_mgr.num_active_sessions()
+
+
+def _resident_memory():
+    """Resident set size of this process in bytes (Linux; None elsewhere)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+RERUN_SECONDS = Histogram(
+    'vd_rerun_duration_seconds', 'Duration of page and fragment reruns.', ('page', 'fragment'))
+LOADER_SECONDS = Histogram(
+    'vd_loader_duration_seconds', 'Duration of cached loader calls, cache hits included.', ('loader', 'dataset'))
+CACHE_REQUESTS = Counter(
+    'vd_cache_requests_total', 'Cached loader calls by result (hit or miss).', ('loader', 'dataset', 'result'))
+MAP_PAYLOAD_BYTES = Histogram(
+    'vd_map_payload_bytes', 'GeoJSON bytes embedded in a rendered folium map.', ('map',), BYTES_BUCKETS)
+ACTIVE_SESSIONS = Gauge('vd_active_sessions', 'Sessions connected to the Streamlit server.', _active_sessions)
+RESIDENT_MEMORY = Gauge(
+    'vd_process_resident_memory_bytes', 'Resident memory of the app process.', _resident_memory)
+
+REGISTRY = (RERUN_SECONDS, LOADER_SECONDS, CACHE_REQUESTS, MAP_PAYLOAD_BYTES, ACTIVE_SESSIONS, RESIDENT_MEMORY)
+
+
+def exposition():
+    """All metrics in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+def cached_loader(fn=None, **cache_kwargs):
+    """
+    `st.cache_data` that also records the loader's call time and cache hits/misses.
+
+    The cached body only runs on a miss, so it flags the call; the outer wrapper
+    times the call and counts it under the loader's name and, for loaders with
+    a `name` parameter (the registered dataset), under that dataset. Loaders
+    may call each other: each call saves and restores the flag of the one
+    around it, so an inner hit does not hide an outer miss.
+
+    Args:
+        **cache_kwargs: Passed to `st.cache_data` (e.g. max_entries).
+
+    Example:
+        @cached_loader
+        def _load_table(name, field, fingerprint): ...
+    """
+    def decorator(fn):
+        loader = fn.__name__
+        signature = inspect.signature(fn)
+        takes_dataset = 'name' in signature.parameters
+        state = threading.local()
+
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            state.miss = True
+            return fn(*args, **kwargs)
+
+        cached = st.cache_data(compute, **cache_kwargs)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            dataset = signature.bind(*args, **kwargs).arguments['name'] if takes_dataset else ''
+            outer = getattr(state, 'miss', False)
+            state.miss = False
+            start = time.perf_counter()
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                LOADER_SECONDS.observe(time.perf_counter() - start, loader=loader, dataset=dataset)
+                CACHE_REQUESTS.inc(loader=loader, dataset=dataset, result='miss' if state.miss else 'hit')
+                state.miss = outer
+
+        wrapper.clear = cached.clear
+        return wrapper
+
+    return decorator(fn) if fn is not None else decorator
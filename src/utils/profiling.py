@@ -0,0 +1,196 @@
+"""
+Opt-in profiling of full page reruns.
+
+Add `?profile=1` to a page URL (one capture, the parameter is then removed) or
+start the app with VD_PROFILE=1 (every full rerun) to profile the page script:
+
+- a sampling profiler records the script thread's stack every
+  PROFILE_INTERVAL seconds and writes folded stacks (`<stamp>_<page>.folded`,
+  one "frame;frame;frame count" line per stack), ready for flamegraph.pl or
+  speedscope;
+- a tracemalloc snapshot taken at the end of the run lists the top allocation
+  sites (`<stamp>_<page>.alloc.txt`).
+
+Captures go to PROFILE_DIR, which keeps the newest PROFILE_MAX_CAPTURES. When
+the mode is off, a page run only pays one flag check and one query parameter
+lookup.
+"""
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.config import PROFILE_ALWAYS, PROFILE_DIR, PROFILE_INTERVAL, PROFILE_MAX_CAPTURES
+
+TOP_ALLOCATIONS = 30
+TRACE_FRAMES = 10
+
+# session id -> running Capture
+_active = {}
+
+# tracemalloc is process-wide: captures of concurrent sessions share it, and
+# the last one to finish stops it (only if a capture started it)
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Capture:
+    """One profiled page run: the sampler plus its share of the tracemalloc session."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        _acquire_tracing()
+        self.sampler = StackSampler(threading.get_ident())
+        self.sampler.start()
+
+    def stop(self):
+        """
+        Stops sampling and returns (folded stacks, tracemalloc snapshot).
+
+        The snapshot is None if tracemalloc was stopped from outside the captures.
+        """
+        self.sampler.stop()
+        try:
+            snapshot = None
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, __file__),  # The sampler's own bookkeeping
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                ])
+        finally:
+            _release_tracing()
+        return self.sampler.stacks, snapshot
+
+
+def requested():
+    """Whether this run should be profiled (env var or `?profile=1`)."""
+    return PROFILE_ALWAYS or st.query_params.get('profile') == '1'
+
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def start_capture(page):
+    """Starts profiling the current full run of `page` if requested."""
+    if not requested():
+        return
+    session_id = _session_id()
+    stale = _active.pop(session_id, None)
+    if stale is not None:
+        stale.stop()  # The previous run stopped early (st.stop or an exception); discard it
+    _active[session_id] = Capture(page)
+
+
+def discard_capture():
+    """Stops the capture of the current run, if any, without writing it (the run did not complete)."""
+    capture = _active.pop(_session_id(), None)
+    if capture is not None:
+        capture.stop()
+
+
+def finish_capture():
+    """
+    Stops the capture of the current run, writes its files and enforces retention.
+
+    Returns:
+        str: Path prefix of the written files, or None if no capture was running.
+    """
+    capture = _active.pop(_session_id(), None)
+    if capture is None:
+        return None
+    stacks, snapshot = capture.stop()
+    elapsed = time.time() - capture.started
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(capture.started))
+    page = re.sub(r'\W+', '-', capture.page)
+    prefix = os.path.join(PROFILE_DIR, f"{stamp}-{os.getpid()}_{page}")
+    with open(f"{prefix}.folded", 'w', encoding='utf-8') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(f"{prefix}.alloc.txt", 'w', encoding='utf-8') as f:
+        f.write(f"Page: {capture.page}\nRun time: {elapsed:.3f} s, samples: {sum(stacks.values())}\n")
+        if snapshot is None:
+            f.write("Traced memory: unavailable (tracemalloc was stopped during the run)\n")
+            stats = []
+        else:
+            stats = snapshot.statistics('lineno')
+            total = sum(stat.size for stat in stats)
+            f.write(f"Traced memory: {total / 1024:.1f} KiB in {len(stats)} sites\n\n")
+        for stat in stats[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+    _enforce_retention()
+
+    if st.query_params.get('profile') == '1':
+        del st.query_params['profile']  # One capture per request
+    return prefix
+
+
+def _enforce_retention(directory=PROFILE_DIR, max_captures=PROFILE_MAX_CAPTURES):
+    """Deletes the oldest captures beyond `max_captures` (both files of a capture share a prefix)."""
+    captures = {}
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(('.folded', '.alloc.txt')):
+            prefix = entry.name.split('.', 1)[0]
+            captures[prefix] = max(captures.get(prefix, 0), entry.stat().st_mtime)
+    prefixes = sorted(captures, key=captures.get)
+    for prefix in prefixes[:max(0, len(prefixes) - max_captures)]:
+        for suffix in ('.folded', '.alloc.txt'):
+            try:
+                os.remove(os.path.join(directory, prefix + suffix))
+            except FileNotFoundError:
+                pass  # Removed concurrently by another process
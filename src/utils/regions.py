@@ -0,0 +1,231 @@
+"""
+Entity hierarchy: World > continents > countries.
+
+The datasets mix countries with aggregates ('World', continents, and CSET
+groupings such as 'NATO (CSET)'). The hierarchy is built once per version of
+the source files from the entities' codes (OWID uses ISO A3 codes for
+countries) and the continent of each country in the world GeoJSON. It answers
+"what kind of entity is X", "children of X" and "map shapes of X" with dict
+lookups, builds boolean row masks without string scans, and can recompute the
+aggregates from their countries to check them against the provided ones.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.config import DATA_PATH, WORLD_MAP
+from utils.fingerprint import file_fingerprint
+from utils.registry import registry
+
+WORLD = 'World'
+CONTINENTS = ('Africa', 'Asia', 'Europe', 'North America', 'Oceania', 'South America')
+ENTITY_KINDS = ('world', 'continent', 'country', 'group')
+
+
+def hierarchy_sources():
+    """CSV files (relative to DATA_PATH) whose entities make up the hierarchy: every registered dataset."""
+    return [spec.csv for spec in registry().values()]
+
+
+def entity_kind(name, code=None):
+    """
+    Classifies one entity from its name and OWID code.
+
+    Returns:
+        str: 'world', 'continent', 'country' (has an ISO A3 or OWID country
+             code) or 'group' (any other aggregate, e.g. the CSET groupings).
+    """
+    if name == WORLD or code == 'OWID_WRL':
+        return 'world'
+    if name in CONTINENTS:
+        return 'continent'
+    if isinstance(code, str) and code:
+        return 'country'
+    return 'group'
+
+
+class EntityHierarchy:
+    """
+    World > continent > country tree over the entities of the datasets.
+
+    Args:
+        entity_codes (dict): Entity name -> OWID code (None for aggregates).
+        geo_countries (dict): Country code (adm0_a3) -> (GeoJSON 'name', continent).
+
+    Attributes:
+        kinds (dict): Entity -> kind, see `entity_kind`.
+        parents (dict): Entity -> parent entity (countries without a known
+                        continent hang directly from World).
+        aggregates (frozenset): Every entity that is not a country.
+    """
+
+    def __init__(self, entity_codes, geo_countries):
+        self.kinds = {name: entity_kind(name, code) for name, code in entity_codes.items()}
+        self.kinds.setdefault(WORLD, 'world')
+        self.parents = {}
+        children = {WORLD: []}
+        map_names = {}
+
+        for continent in CONTINENTS:
+            self.kinds.setdefault(continent, 'continent')
+            self.parents[continent] = WORLD
+            children[WORLD].append(continent)
+            children[continent] = []
+            map_names[continent] = []
+
+        for name, code in entity_codes.items():
+            if self.kinds[name] != 'country':
+                continue
+            # OWID codes for countries without an ISO code look like 'OWID_KOS'
+            geo = geo_countries.get(code) or geo_countries.get(code.removeprefix('OWID_'))
+            continent = geo[1] if geo and geo[1] in children else WORLD
+            self.parents[name] = continent
+            children[continent].append(name)
+            children[name] = []
+            if geo:
+                map_names[name] = [geo[0]]
+                if continent != WORLD:
+                    map_names[continent].append(geo[0])
+
+        map_names[WORLD] = [geo_name for geo_name, _ in geo_countries.values()]
+        self._children = {name: tuple(sorted(c)) for name, c in children.items()}
+        self._map_names = {name: tuple(sorted(set(n))) for name, n in map_names.items()}
+        self.aggregates = frozenset(name for name, kind in self.kinds.items() if kind != 'country')
+
+    def kind(self, entity):
+        """Kind of `entity`; entities unknown to the hierarchy are classified by name only."""
+        kind = self.kinds.get(entity)
+        return kind if kind is not None else entity_kind(entity)
+
+    def is_aggregate(self, entity):
+        return self.kind(entity) != 'country'
+
+    def children(self, entity):
+        """Direct children of `entity` (continents of World, countries of a continent)."""
+        return self._children.get(entity, ())
+
+    def countries(self, entity):
+        """Countries under `entity` (the entity itself if it is a country)."""
+        if self.kind(entity) == 'country':
+            return (entity,)
+        return tuple(c for child in self.children(entity) for c in self.countries(child))
+
+    def map_names(self, entity, regions=None):
+        """
+        GeoJSON 'name' of every map shape covered by `entity`.
+
+        Args:
+            regions (dict): Explicit membership of a dataset's aggregates
+                (`DatasetSpec.regions`), used before the GeoJSON continents.
+        """
+        if regions and entity in regions:
+            return regions[entity]
+        return self._map_names.get(entity, ())
+
+    def mask(self, entities, *kinds):
+        """
+        Boolean mask of the rows of `entities` whose kind is one of `kinds`.
+
+        Each distinct entity is looked up once (through the categories of a
+        categorical Series, or a factorization otherwise), then the result is
+        broadcast to the rows.
+
+        Returns:
+            numpy.ndarray: Boolean array aligned with `entities`.
+        """
+        if isinstance(entities.dtype, pd.CategoricalDtype):
+            codes, uniques = entities.cat.codes.to_numpy(), entities.cat.categories
+        else:
+            codes, uniques = pd.factorize(entities)
+        selected = np.array([self.kind(e) in kinds for e in uniques] + [False], dtype=bool)
+        return selected[codes]  # code -1 (missing) maps to the trailing False
+
+    def rollup(self, df, value_col):
+        """
+        Recomputes World and continent totals from the country rows of `df`.
+
+        Returns:
+            pandas.DataFrame: Columns 'Entity', 'Year' and `value_col`.
+        """
+        countries = df[self.mask(df['Entity'], 'country')]
+        parent = countries['Entity'].map(self.parents)
+        by_continent = (countries[parent != WORLD]
+                        .assign(Entity=parent[parent != WORLD].to_numpy())
+                        .groupby(['Entity', 'Year'], as_index=False, observed=True)[value_col].sum())
+        world = countries.groupby('Year', as_index=False)[value_col].sum().assign(Entity=WORLD)
+        return pd.concat([by_continent, world[['Entity', 'Year', value_col]]], ignore_index=True)
+
+    def check_rollups(self, df, value_col):
+        """
+        Compares the aggregates provided in `df` with the sum of their countries.
+
+        Returns:
+            pandas.DataFrame: Columns 'Entity', 'Year', 'Provided', 'Rollup' and
+                              'Coverage' (Rollup / Provided) for every aggregate
+                              row of `df` that has a rollup.
+        """
+        provided = df[self.mask(df['Entity'], 'world', 'continent')][['Entity', 'Year', value_col]]
+        provided = provided.astype({'Entity': str}).rename(columns={value_col: 'Provided'})
+        rollup = self.rollup(df, value_col).astype({'Entity': str}).rename(columns={value_col: 'Rollup'})
+        checked = provided.merge(rollup, on=['Entity', 'Year'], how='inner')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            checked['Coverage'] = checked['Rollup'] / checked['Provided']
+        return checked.sort_values(['Entity', 'Year'], ignore_index=True)
+
+
+def read_geo_countries(path):
+    """
+    Reads the country code, name and continent of every GeoJSON feature.
+
+    Only the properties are parsed (no geometries). Features are keyed by
+    'adm0_a3', which is set even where 'iso_a3' is '-99' (e.g. France, Norway).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+    return {
+        feature['properties']['adm0_a3']: (feature['properties']['name'], feature['properties'].get('continent'))
+        for feature in features
+    }
+
+
+def read_entity_codes(paths):
+    """Entity name -> OWID code (None for aggregates) over the given CSV files."""
+    entity_codes = {}
+    for path in paths:
+        try:
+            df = pd.read_csv(path, usecols=['Entity', 'Code']).drop_duplicates('Entity')
+        except FileNotFoundError:
+            continue
+        for name, code in zip(df['Entity'], df['Code']):
+            entity_codes.setdefault(name, code if isinstance(code, str) else None)
+    return entity_codes
+
+
+@st.cache_resource(max_entries=2)
+def _load_hierarchy(fingerprint):
+    """Builds the hierarchy once per version of its sources (`fingerprint` is the cache key)."""
+    geo_path = os.path.join(DATA_PATH, WORLD_MAP)
+    geo_countries = read_geo_countries(geo_path) if os.path.exists(geo_path) else {}
+    entity_codes = read_entity_codes(os.path.join(DATA_PATH, f) for f in hierarchy_sources())
+    return EntityHierarchy(entity_codes, geo_countries)
+
+
+def hierarchy_fingerprint():
+    """Fingerprint of the files the hierarchy is built from (every registered CSV and the world map)."""
+    return file_fingerprint(*(os.path.join(DATA_PATH, f) for f in hierarchy_sources() + [WORLD_MAP]))
+
+
+def load_hierarchy():
+    """Returns the entity hierarchy for the current version of the data files."""
+    return _load_hierarchy(hierarchy_fingerprint())
+
+
+if __name__ == '__main__':
+    # Rollup report: how much of each provided aggregate its countries explain
+    from utils.datasets import load_rollup_check
+
+    checked = load_rollup_check('papers')
+    print(checked.groupby('Entity')['Coverage'].describe()[['count', 'min', '50%', 'max']].to_string())
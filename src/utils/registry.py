@@ -0,0 +1,168 @@
+"""
+Declarative dataset registry.
+
+A dataset is a folder under DATA_PATH holding an OWID export (`<slug>.csv`)
+and its `<slug>.metadata.json`. Adding a `dashboard` block to the metadata is
+all it takes to register it:
+
+    "dashboard": {
+        "name": "private-investment",
+        "label": "Inversión Privada en IA",
+        "value_column": "Global total private investment in AI",
+        "value_name": "Investment",
+        "divide_by": 1000000000,
+        "unit": "miles de millones USD",
+        "entities": "regions",
+        "map_join": "name"
+    }
+
+- name: registry key, also the dataset's name in the data API.
+- label: name shown in the UI.
+- value_column / value_name: source column and the name the app uses for it.
+- divide_by (optional): unit scaling applied on ingest (USD -> billions here).
+- integer (optional): the values are counts, stored with a compact integer dtype.
+- entities: 'countries' or 'regions' (continents and World only).
+- map_join: GeoJSON property the map joins on ('iso_a3' or 'name'), or null
+  for datasets without a map.
+- regions (optional): aggregate -> GeoJSON names of the shapes it covers, for
+  aggregates whose membership in the source differs from the GeoJSON
+  continent (e.g. the private investment 'Europe' excludes Russia). Other
+  aggregates fall back to `utils.regions.EntityHierarchy.map_names`.
+
+Datasets with one value column per category (e.g. the research fields of the
+publications export) declare `"field_prefix"` instead of `value_column`; every
+column starting with it becomes one 'Field' of the long table.
+
+Every registered dataset goes through the shared pipeline of `utils.datasets`.
+This module only reads the declarations, so it can be imported from anywhere.
+"""
+import functools
+import json
+import os
+
+from utils.config import DATA_PATH
+from utils.fingerprint import file_fingerprint
+
+METADATA_SUFFIX = '.metadata.json'
+ENTITY_TYPES = ('countries', 'regions')
+MAP_JOINS = ('iso_a3', 'name')
+
+
+class DatasetSpec:
+    """
+    One registered dataset.
+
+    Args:
+        csv (str): Path of the CSV relative to DATA_PATH.
+        dashboard (dict): The `dashboard` block of the metadata.
+        title (str): Chart title from the OWID metadata (defaults to the label).
+        selection (list): Entities OWID selects by default in the chart.
+        data_path (str): Folder the CSV path is relative to.
+
+    Raises:
+        ValueError: If the declaration is incomplete or inconsistent.
+    """
+
+    def __init__(self, csv, dashboard, title=None, selection=(), data_path=DATA_PATH):
+        self.csv = csv
+        self.data_path = data_path
+        try:
+            self.name = dashboard['name']
+            self.label = dashboard['label']
+            self.value_name = dashboard['value_name']
+        except KeyError as e:
+            raise ValueError(f"Dataset '{csv}': missing dashboard key {e}.") from None
+        self.value_column = dashboard.get('value_column')
+        self.field_prefix = dashboard.get('field_prefix')
+        if (self.value_column is None) == (self.field_prefix is None):
+            raise ValueError(f"Dataset '{self.name}': declare exactly one of 'value_column' and 'field_prefix'.")
+        self.divide_by = dashboard.get('divide_by')
+        self.integer = dashboard.get('integer', False)
+        self.unit = dashboard.get('unit', '')
+        self.entities = dashboard.get('entities', 'countries')
+        self.map_join = dashboard.get('map_join')
+        self.regions = {region: tuple(shapes) for region, shapes in dashboard.get('regions', {}).items()}
+        if self.entities not in ENTITY_TYPES:
+            raise ValueError(f"Dataset '{self.name}': unknown entity type '{self.entities}'. Expected one of {ENTITY_TYPES}.")
+        if self.map_join is not None and self.map_join not in MAP_JOINS:
+            raise ValueError(f"Dataset '{self.name}': unknown map join '{self.map_join}'. Expected one of {MAP_JOINS}.")
+        self.title = title or self.label
+        self.selection = list(selection)
+
+    @property
+    def path(self):
+        return os.path.join(self.data_path, self.csv)
+
+    @property
+    def has_fields(self):
+        return self.field_prefix is not None
+
+    def fingerprint(self):
+        """Fingerprint of the dataset's CSV (see `utils.fingerprint`)."""
+        return file_fingerprint(self.path)
+
+    def __repr__(self):
+        return f"DatasetSpec({self.name!r}, {self.csv!r})"
+
+
+def read_spec(metadata_path, data_path=DATA_PATH):
+    """
+    Reads the declaration of one dataset.
+
+    Returns:
+        DatasetSpec: The dataset, or None if its metadata has no `dashboard` block.
+    """
+    with open(metadata_path, encoding='utf-8') as f:
+        metadata = json.load(f)
+    dashboard = metadata.get('dashboard')
+    if dashboard is None:
+        return None
+    csv = os.path.relpath(metadata_path[:-len(METADATA_SUFFIX)] + '.csv', data_path)
+    chart = metadata.get('chart', {})
+    return DatasetSpec(csv, dashboard, chart.get('title'), chart.get('selection', ()), data_path)
+
+
+def discover_datasets(data_path=DATA_PATH):
+    """
+    Scans the dataset folders of `data_path`.
+
+    Returns:
+        dict: Dataset name -> DatasetSpec, in folder order.
+
+    Raises:
+        ValueError: If two folders declare the same name.
+    """
+    datasets = {}
+    for folder in sorted(os.scandir(data_path), key=lambda e: e.name):
+        if not folder.is_dir():
+            continue
+        for entry in sorted(os.listdir(folder.path)):
+            if not entry.endswith(METADATA_SUFFIX):
+                continue
+            spec = read_spec(os.path.join(folder.path, entry), data_path)
+            if spec is None:
+                continue
+            if spec.name in datasets:
+                raise ValueError(f"Dataset name '{spec.name}' is declared by both "
+                                 f"'{datasets[spec.name].csv}' and '{spec.csv}'.")
+            datasets[spec.name] = spec
+    return datasets
+
+
+@functools.cache
+def registry():
+    """Registered datasets of DATA_PATH, read once per process."""
+    return discover_datasets()
+
+
+def get_spec(name):
+    """
+    Returns the declaration of a registered dataset.
+
+    Raises:
+        KeyError: If no dataset is registered under `name`.
+    """
+    try:
+        return registry()[name]
+    except KeyError:
+        raise KeyError(f"Unknown dataset '{name}'. Registered: {sorted(registry())}.") from None
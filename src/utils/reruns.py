@@ -0,0 +1,163 @@
+"""
+Partial reruns and rerun-scope reporting.
+
+Page sections that own their widgets are `partial` units: Streamlit fragments,
+so interacting with one of their widgets reruns only that function (with the
+arguments it was last called with) instead of the whole page script. Their
+data dependencies are explicit: everything a unit needs is passed in as
+arguments or loaded inside it through the cached loaders.
+
+Every unit, and every `unit` block of the page body, records its execution
+time. With the report enabled (`?reruns=1` in the URL or VD_RERUN_REPORT=1),
+each fragment rerun shows what it recomputed and the sidebar lists the last
+interactions with their scope (whole page or one fragment) and units. Page and
+fragment rerun durations are always exported as metrics (`utils.metrics`).
+"""
+import functools
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.config import RERUN_REPORT
+from utils.metrics import RERUN_SECONDS
+from utils.profiling import discard_capture, finish_capture, start_capture
+
+REPORT_SIZE = 20
+_LOG_KEY = '_rerun_log'
+
+
+def report_enabled():
+    """Whether the rerun-scope report is shown (env var or `?reruns=1`)."""
+    return RERUN_REPORT or st.query_params.get('reruns') == '1'
+
+
+def _log():
+    """Last REPORT_SIZE interactions of this session, newest last."""
+    if _LOG_KEY not in st.session_state:
+        st.session_state[_LOG_KEY] = deque(maxlen=REPORT_SIZE)
+    return st.session_state[_LOG_KEY]
+
+
+def _record(name, start):
+    log = _log()
+    if log:
+        log[-1]['units'].append((name, (time.perf_counter() - start) * 1000))
+
+
+def _is_fragment_rerun():
+    """True if the current run was triggered by a widget of the fragment being executed."""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run and ctx.current_fragment_id in ctx.fragment_ids_this_run)
+
+
+def begin_page(page):
+    """
+    Opens the record of a full page run; call it at the top of every page script.
+
+    Also starts a profile capture of the run if one was requested (see `utils.profiling`).
+    """
+    _log().append({'page': page, 'scope': 'página completa', 'units': [], 'started': time.perf_counter()})
+    start_capture(page)
+
+
+def end_page():
+    """Closes a full page run: renders the rerun report and saves the profile capture, if any."""
+    try:
+        record = _log()[-1]
+        RERUN_SECONDS.observe(time.perf_counter() - record['started'], page=record['page'], fragment='')
+        with st.sidebar:
+            rerun_report()
+    except BaseException:
+        discard_capture()
+        raise
+    prefix = finish_capture()
+    if prefix is not None:
+        st.toast(f"Perfil guardado en `{prefix}.*`", icon=':material/speed:')
+
+
+@contextmanager
+def page_run(page):
+    """
+    Wraps the body of a page script between `begin_page` and `end_page`.
+
+    If the run does not complete (an exception, `st.stop`, or a rerun requested
+    by an interaction mid-run), the profile capture is discarded instead of
+    leaving its sampler and tracemalloc running.
+
+    Example:
+        with page_run('Plots'):
+            ...
+    """
+    begin_page(page)
+    try:
+        yield
+    except BaseException:
+        discard_capture()
+        raise
+    end_page()
+
+
+@contextmanager
+def unit(name):
+    """Times a block of the page body as one unit of the current run."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, start)
+
+
+def partial(name):
+    """
+    Turns a view function into an isolated fragment unit.
+
+    Args:
+        name (str): Unit name shown in the report.
+
+    Example:
+        @partial('Publicaciones anuales')
+        def annual_papers(): ...
+    """
+    def decorator(fn):
+        @st.fragment
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            fragment_rerun = _is_fragment_rerun()
+            if fragment_rerun:
+                log = _log()
+                page = log[-1]['page'] if log else ''
+                log.append({'page': page, 'scope': f'fragmento «{name}»', 'units': []})
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, start)
+                if fragment_rerun:
+                    RERUN_SECONDS.observe(time.perf_counter() - start, page=page, fragment=name)
+                if fragment_rerun and report_enabled():
+                    units = ', '.join(f"{n} ({ms:.0f} ms)" for n, ms in _log()[-1]['units'])
+                    st.caption(f"↻ Recalculado solo: {units}")
+        return wrapper
+    return decorator
+
+
+def rerun_report():
+    """Renders the last interactions and what each one recomputed (when the report is enabled)."""
+    if not report_enabled():
+        return
+    rows = [
+        {
+            'Página': record['page'],
+            'Alcance': record['scope'],
+            'Unidades': ', '.join(name for name, _ in record['units']),
+            'ms': sum(ms for _, ms in record['units']),
+        }
+        for record in reversed(_log())
+    ]
+    with st.expander('Informe de recálculos', icon=':material/refresh:'):
+        st.dataframe(pd.DataFrame(rows), hide_index=True,
+                     column_config={'ms': st.column_config.NumberColumn('ms', format='%.0f')})
@@ -0,0 +1,160 @@
+"""
+Small in-memory full-text search engine.
+
+An inverted index with accent-insensitive tokenization (so "maquinas"
+matches "Máquinas" and "razon" matches "razón") and BM25 ranking. Documents
+can be added, replaced and removed individually, so a changed source only
+re-indexes the documents that changed.
+Results are memoized per query until the index changes.
+"""
+import hashlib
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+_TOKEN = re.compile(r'\w+')
+
+# Common Spanish and English words that carry no meaning for search
+STOPWORDS = frozenset("""
+a al como con de del el en entre es esta este la las lo los mas o para por que se sin su sus un una y
+an and as at be by for from in is it of on or that the this to was were with
+""".split())
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def normalize(text):
+    """Lowercases and strips accents/diacritics ('Máquinas' -> 'maquinas')."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Splits text into normalized tokens, dropping stopwords and single characters."""
+    return [t for t in _TOKEN.findall(normalize(text)) if len(t) > 1 and t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    Inverted index over documents made of weighted text fields.
+
+    Args:
+        field_weights (dict): Field name -> weight; a token in a field with
+                              weight 2 counts twice towards its term frequency.
+        max_cached_queries (int): Size of the per-query result memo.
+    """
+
+    def __init__(self, field_weights, max_cached_queries=256):
+        self.field_weights = field_weights
+        self.postings = {}      # term -> {doc_id: weighted term frequency}
+        self.doc_terms = {}     # doc_id -> Counter of weighted term frequencies
+        self.doc_lengths = {}   # doc_id -> sum of weighted term frequencies
+        self.doc_hashes = {}    # doc_id -> content hash, for incremental updates
+        self.total_length = 0
+        self.version = None
+        self._results = OrderedDict()
+        self._max_cached_queries = max_cached_queries
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    @staticmethod
+    def content_hash(fields):
+        return hashlib.sha1('\x1f'.join(fields.get(k, '') for k in sorted(fields)).encode()).hexdigest()
+
+    def _add(self, doc_id, fields):
+        terms = Counter()
+        for name, weight in self.field_weights.items():
+            for token in tokenize(fields.get(name, '')):
+                terms[token] += weight
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_terms[doc_id] = terms
+        self.doc_hashes[doc_id] = self.content_hash(fields)
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self.total_length += self.doc_lengths[doc_id]
+
+    def _remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id)
+        for term in terms:
+            docs = self.postings[term]
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+        del self.doc_hashes[doc_id]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def sync(self, documents, version):
+        """
+        Brings the index in line with `documents`, touching only what changed.
+
+        Args:
+            documents (dict): doc_id -> {field: text}.
+            version: Identifier of this document set (e.g. a file fingerprint);
+                     calling again with the same version is a no-op.
+
+        Returns:
+            tuple: (added, updated, removed) document counts.
+        """
+        with self._lock:
+            if version == self.version:
+                return 0, 0, 0
+            added = updated = 0
+            removed = [doc_id for doc_id in self.doc_terms if doc_id not in documents]
+            for doc_id in removed:
+                self._remove(doc_id)
+            for doc_id, fields in documents.items():
+                current = self.doc_hashes.get(doc_id)
+                if current == self.content_hash(fields):
+                    continue
+                if current is not None:
+                    self._remove(doc_id)
+                    updated += 1
+                else:
+                    added += 1
+                self._add(doc_id, fields)
+            self.version = version
+            self._results.clear()
+            return added, updated, len(removed)
+
+    def _expand(self, token, is_last):
+        """Terms matched by a query token; the last token also matches as a prefix (search as you type)."""
+        if not is_last:
+            return [token] if token in self.postings else []
+        return [term for term in self.postings if term.startswith(token)]
+
+    def search(self, query, limit=20):
+        """
+        Ranks documents for a free-text query with BM25.
+
+        Returns:
+            list: (doc_id, score) pairs, best first.
+        """
+        tokens = tokenize(query)
+        key = (tuple(tokens), limit)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+            scores = {}
+            n_docs = len(self.doc_terms)
+            avg_length = self.total_length / n_docs if n_docs else 0
+            for i, token in enumerate(tokens):
+                for term in self._expand(token, i == len(tokens) - 1):
+                    docs = self.postings[term]
+                    idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for doc_id, tf in docs.items():
+                        norm = tf + K1 * (1 - B + B * self.doc_lengths[doc_id] / avg_length)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / norm
+            results = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+            self._results[key] = results
+            if len(self._results) > self._max_cached_queries:
+                self._results.popitem(last=False)
+            return results
@@ -1,12 +1,16 @@
 import streamlit as st
 
+from utils.api import start_data_api
+
 def sidebar():
     """
     Renders the navigation sidebar for the Streamlit application.
 
     Includes links to all main pages of the application with appropriate labels
-    and icons.
+    and icons. Every page renders the sidebar, so it also makes sure the
+    process-wide data API is running (see `utils.api.start_data_api`).
     """
+    start_data_api()
     st.page_link(page='app.py', label='Home', icon=':material/home:')
     st.page_link(page='pages/plots.py', label='Plots', icon=':material/dataset:')
     st.page_link(page='pages/maps.py', label='Mapas y Vistas', icon=':material/map:')
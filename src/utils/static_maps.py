@@ -0,0 +1,191 @@
+"""
+Server-side static choropleths.
+
+Renders the map views as PNG/SVG images with GeoPandas/matplotlib instead of
+shipping the GeoJSON and Leaflet to the browser. Images are cached on disk per
+(dataset, year, binning, format, data version) inside Streamlit's static
+folder, so every image also has a stable URL that can be embedded elsewhere.
+The version is a digest of everything the image is drawn from (the year's
+colors, the classes, the world geometry and the labels), so a change to the
+data, the dataset's region membership, the hierarchy, the number of classes
+or the palette gets new files instead of serving the old ones.
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+
+import matplotlib
+matplotlib.use('Agg')  # Headless backend, the server has no display
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+import streamlit as st
+
+from utils.config import DATA_PATH, WORLD_MAP, STATIC_MAP_DIR, STATIC_MAP_URL, STATIC_MAP_MAX_FILES
+from utils.data import (
+    load_annual_papers_map_data, load_annual_investment_map_data,
+    load_papers_choropleth_bins, load_investment_choropleth_bins
+)
+from utils.datasets import generic_datasets, load_choropleth_bins, load_world_geo
+from utils.fingerprint import file_fingerprint
+from utils.reruns import partial
+
+STATIC_FORMATS = ('png', 'svg')
+
+# Dataset name -> (data loader, bins loader, GeoJSON join property, title, legend value format)
+STATIC_DATASETS = {
+    'papers': (load_annual_papers_map_data, load_papers_choropleth_bins, 'iso_a3',
+               'Publicaciones anuales sobre IA', '{:,.0f}'),
+    'investment': (load_annual_investment_map_data, load_investment_choropleth_bins, 'name',
+                   'Inversión privada en IA (miles de millones USD)', '{:,.1f}'),
+}
+# Other registered datasets with a map, through the shared pipeline
+STATIC_DATASETS.update({
+    spec.name: (lambda: (None, load_world_geo()), functools.partial(load_choropleth_bins, spec.name),
+                spec.map_join, f"{spec.label} ({spec.unit})" if spec.unit else spec.label,
+                '{:,.0f}' if spec.integer else '{:,.1f}')
+    for spec in generic_datasets(with_map=True)
+})
+
+
+def _evict(directory=STATIC_MAP_DIR, max_files=STATIC_MAP_MAX_FILES):
+    """Deletes the least recently used images once the cache holds more than `max_files`."""
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file() and e.name.endswith(STATIC_FORMATS)]
+    except FileNotFoundError:
+        return
+    if len(entries) <= max_files:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass  # Removed concurrently by another session
+
+
+def image_version(dataset, year, bins):
+    """
+    Short digest of what the image of `dataset` for `year` is drawn from.
+
+    Covers the year's shape colors and the classes in `bins` (so the data,
+    region membership, hierarchy, number of classes and palette), the world
+    geometry and the dataset's join key, title and legend format.
+    """
+    _, _, join_key, title, value_fmt = STATIC_DATASETS[dataset]
+    content = {
+        'colors': bins['by_year'].get(int(year), {}),
+        'breaks': bins['breaks'],
+        'palette': bins['colors'],
+        'world': file_fingerprint(os.path.join(DATA_PATH, WORLD_MAP)),
+        'labels': [join_key, title, value_fmt],
+    }
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()[:10]
+
+
+def static_map_filename(dataset, year, method, version, fmt='png', **filters):
+    """Cache file name for one rendered map, tagged with its `image_version`."""
+    parts = [dataset, str(year), method] + [re.sub(r'\W+', '-', str(v)) for _, v in sorted(filters.items())]
+    return f"{'_'.join(parts)}.{version}.{fmt}"
+
+
+def render_static_map(dataset, year, method, fmt='png', **filters):
+    """
+    Renders (or reuses) the static choropleth of `dataset` for `year`.
+
+    Args:
+        dataset (str): Key of STATIC_DATASETS ('papers' or 'investment').
+        year (int): Year to draw.
+        method (str): Binning method, see `utils.binning.BINNING_METHODS`.
+        fmt (str): 'png' or 'svg'.
+        **filters: Extra arguments of the dataset's bins loader (e.g. `field`).
+
+    Returns:
+        str: Path of the image on disk, or None if there is no data to draw.
+    """
+    if fmt not in STATIC_FORMATS:
+        raise ValueError(f"Unsupported static map format '{fmt}'. Expected one of {STATIC_FORMATS}.")
+    load_data, load_bins, join_key, title, value_fmt = STATIC_DATASETS[dataset]
+
+    bins = load_bins(method, **filters)
+    if not bins['breaks']:
+        return None
+    version = image_version(dataset, year, bins)
+    path = os.path.join(STATIC_MAP_DIR, static_map_filename(dataset, year, method, version, fmt, **filters))
+    if os.path.exists(path):
+        os.utime(path)  # Refresh for LRU eviction
+        return path
+
+    _, world_geo = load_data()
+    if world_geo is None or world_geo.empty:
+        return None
+    year_colors = bins['by_year'].get(int(year), {})
+
+    fig, ax = plt.subplots(figsize=(12, 6), dpi=100)
+    world_geo.plot(
+        ax=ax,
+        color=[year_colors.get(key, 'lightgray') for key in world_geo[join_key]],
+        edgecolor='white',
+        linewidth=0.2
+    )
+    breaks = bins['breaks']
+    handles = [
+        Patch(facecolor=color, label=f"{value_fmt.format(low)} – {value_fmt.format(high)}")
+        for color, low, high in zip(bins['colors'], breaks[:-1], breaks[1:])
+    ]
+    handles.append(Patch(facecolor='lightgray', label='Sin datos'))
+    ax.legend(handles=handles, loc='lower left', fontsize=8, frameon=False)
+    ax.set_title(f"{title} - {year}")
+    ax.set_axis_off()
+    fig.tight_layout()
+
+    os.makedirs(STATIC_MAP_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format=fmt)
+    plt.close(fig)
+    os.replace(tmp_path, path)  # Atomic, concurrent sessions never see half-written files
+    _evict()
+    return path
+
+
+@partial('Mapa estático')
+def static_map(dataset, method, fmt='png', **filters):
+    """
+    Displays the static version of a map view: a year slider, the cached
+    image, its embeddable URL and a download button. Runs as a fragment, so
+    moving the slider only re-renders the image.
+
+    Args:
+        dataset (str): Key of STATIC_DATASETS ('papers' or 'investment').
+        method (str): Binning method.
+        fmt (str): 'png' or 'svg'.
+        **filters: Extra arguments of the dataset's bins loader (e.g. `field`).
+    """
+    bins = STATIC_DATASETS[dataset][1](method, **filters)
+    years = sorted(bins['by_year'])
+    if not years:
+        st.warning("No hay datos disponibles para generar el mapa estático.")
+        return
+    if len(years) == 1:
+        # A slider needs min < max
+        selected_year = years[0]
+        st.caption(f"Año: {selected_year}")
+    else:
+        selected_year = st.slider('Selecciona el año:', years[0], years[-1], years[-1])
+
+    path = render_static_map(dataset, selected_year, method, fmt, **filters)
+    if path is None:
+        st.warning("No hay datos disponibles para generar el mapa estático.")
+        return
+
+    st.image(path, use_container_width=True)
+    filename = os.path.basename(path)
+    st.caption(f"Imagen embebible: `{STATIC_MAP_URL}/{filename}`")
+    with open(path, 'rb') as f:
+        st.download_button(
+            'Descargar imagen',
+            data=f.read(),
+            file_name=filename,
+            mime='image/svg+xml' if fmt == 'svg' else 'image/png'
+        )
@@ -0,0 +1,214 @@
+"""
+Indexed timeline store.
+
+`data/timeline.json` (TimelineJS format) is parsed and validated once per file
+version. Its events are indexed by year and by era, so the page can request
+slices (a year range and/or one era) whose JSON is cached per filter. YouTube
+embeds can be replaced by thumbnail placeholders that link to the video, so
+the timeline stays light as the number of events grows. Headlines and texts
+are searchable through a shared inverted index (`search_timeline`).
+"""
+import bisect
+import copy
+import hashlib
+import json
+import os
+import re
+
+import streamlit as st
+
+from utils.config import DATA_PATH, TIMELINE_DATA
+from utils.fingerprint import file_fingerprint
+from utils.search import InvertedIndex
+
+TIMELINE_PATH = os.path.join(DATA_PATH, TIMELINE_DATA)
+
+_YOUTUBE_ID = re.compile(r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|embed/|shorts/)|youtu\.be/)([\w-]{11})')
+_HTML_TAG = re.compile(r'<[^>]+>')
+
+
+def event_id(event):
+    """Stable identifier of an event: its `unique_id`, or one derived from year and headline."""
+    if event.get('unique_id'):
+        return event['unique_id']
+    headline = event['text']['headline']
+    return f"{event['start_date']['year']}-{hashlib.sha1(headline.encode()).hexdigest()[:8]}"
+
+
+class TimelineStore:
+    """
+    Parsed timeline with year and era indexes.
+
+    Attributes:
+        fingerprint (str): Version of the timeline file the store was built from.
+        document (dict): The validated TimelineJS document.
+        events (list): Events sorted by start year.
+        years (list): Start year of each event in `events` (sorted, for bisect).
+        by_id (dict): Event id (see `event_id`) -> event.
+        eras (list): Eras as given in the document.
+        era_events (list): For each era, the indices in `events` that fall in it.
+    """
+
+    def __init__(self, document, fingerprint=None):
+        validate_timeline(document)
+        self.fingerprint = fingerprint
+        self.document = document
+        self.events = sorted(document.get('events', []), key=lambda e: e['start_date']['year'])
+        self.years = [e['start_date']['year'] for e in self.events]
+        self.by_id = {event_id(e): e for e in self.events}
+        self.eras = document.get('eras', [])
+        self.era_events = [
+            list(range(*self.year_range_indices(era['start_date']['year'], era['end_date']['year'])))
+            for era in self.eras
+        ]
+
+    def year_range_indices(self, year_from, year_to):
+        """Returns the [start, stop) slice of `events` with year_from <= year <= year_to."""
+        return bisect.bisect_left(self.years, year_from), bisect.bisect_right(self.years, year_to)
+
+    def era_labels(self):
+        """Headlines of the eras, in document order."""
+        return [era['text']['headline'] for era in self.eras]
+
+    def select(self, year_from=None, year_to=None, era=None):
+        """
+        Returns the events matching the filters.
+
+        Args:
+            year_from (int): First year included (default: no lower bound).
+            year_to (int): Last year included (default: no upper bound).
+            era (int): Index of an era in `eras` (default: all eras).
+
+        Returns:
+            list: Matching events, sorted by year.
+        """
+        start, stop = self.year_range_indices(
+            float('-inf') if year_from is None else year_from,
+            float('inf') if year_to is None else year_to
+        )
+        indices = range(start, stop)
+        if era is not None:
+            in_era = set(self.era_events[era])
+            indices = [i for i in indices if i in in_era]
+        return [self.events[i] for i in indices]
+
+
+def validate_timeline(document):
+    """
+    Checks the parts of the TimelineJS format the app relies on.
+
+    Raises:
+        ValueError: Describing the first invalid event or era.
+    """
+    if not isinstance(document, dict) or not isinstance(document.get('events', []), list):
+        raise ValueError("The timeline must be an object with an 'events' list.")
+    for i, event in enumerate(document.get('events', [])):
+        year = event.get('start_date', {}).get('year')
+        if not isinstance(year, int):
+            raise ValueError(f"Event {i} has no integer 'start_date.year'.")
+        if not event.get('text', {}).get('headline'):
+            raise ValueError(f"Event {i} ({year}) has no 'text.headline'.")
+    for i, era in enumerate(document.get('eras', [])):
+        start = era.get('start_date', {}).get('year')
+        end = era.get('end_date', {}).get('year')
+        if not isinstance(start, int) or not isinstance(end, int) or start > end:
+            raise ValueError(f"Era {i} needs integer 'start_date.year' <= 'end_date.year'.")
+        if not era.get('text', {}).get('headline'):
+            raise ValueError(f"Era {i} has no 'text.headline'.")
+
+
+def lazy_media(event):
+    """
+    Replaces a YouTube embed with a thumbnail that links to the video.
+
+    The thumbnail is a single small image instead of a player iframe; other
+    media is returned unchanged.
+    """
+    url = event.get('media', {}).get('url', '')
+    match = _YOUTUBE_ID.search(url)
+    if not match:
+        return event
+    event = copy.deepcopy(event)
+    event['media'] = {
+        'url': f"https://img.youtube.com/vi/{match.group(1)}/hqdefault.jpg",
+        'thumbnail': f"https://img.youtube.com/vi/{match.group(1)}/default.jpg",
+        'link': url,
+        'link_target': '_blank',
+        'caption': '▶ Ver vídeo en YouTube'
+    }
+    return event
+
+
+@st.cache_resource(max_entries=2)
+def _load_store(fingerprint):
+    """Parses the timeline once per file version (`fingerprint` is the cache key)."""
+    with open(TIMELINE_PATH, 'r', encoding='utf-8') as f:
+        return TimelineStore(json.load(f), fingerprint)
+
+
+def load_timeline_store():
+    """
+    Returns the timeline store for the current version of the timeline file.
+
+    Raises:
+        FileNotFoundError: If the timeline file does not exist.
+        ValueError: If the file is not valid JSON or fails validation.
+    """
+    if not os.path.exists(TIMELINE_PATH):
+        raise FileNotFoundError(TIMELINE_PATH)
+    return _load_store(file_fingerprint(TIMELINE_PATH))
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def timeline_json(fingerprint, year_from=None, year_to=None, era=None, lazy=True):
+    """
+    Serialized TimelineJS document for one filter, cached per (file version, filter).
+
+    Eras are kept only if they overlap the selected range (or the selected era).
+
+    Returns:
+        str: JSON for `streamlit_timeline.timeline`, or None if no event matches.
+    """
+    store = _load_store(fingerprint)
+    events = store.select(year_from, year_to, era)
+    if not events:
+        return None
+    if lazy:
+        events = [lazy_media(e) for e in events]
+    first, last = events[0]['start_date']['year'], events[-1]['start_date']['year']
+    if era is not None:
+        eras = [store.eras[era]]
+    else:
+        eras = [e for e in store.eras if e['start_date']['year'] <= last and e['end_date']['year'] >= first]
+    document = {k: v for k, v in store.document.items() if k not in ('events', 'eras')}
+    document.update(events=events, eras=eras)
+    return json.dumps(document, ensure_ascii=False)
+
+
+@st.cache_resource
+def _timeline_index():
+    """Process-wide search index; `search_timeline` keeps it in sync with the file."""
+    return InvertedIndex({'headline': 3, 'text': 1})
+
+
+def search_timeline(store, query, limit=20):
+    """
+    Full-text search over event headlines and texts.
+
+    The index is updated incrementally (only changed events are re-indexed)
+    the first time it is queried after the timeline file changes; results are
+    memoized per query.
+
+    Returns:
+        list: Matching events, best first.
+    """
+    index = _timeline_index()
+    if index.version != store.fingerprint:
+        index.sync({
+            doc_id: {
+                'headline': event['text']['headline'],
+                'text': _HTML_TAG.sub(' ', event['text'].get('text', ''))
+            }
+            for doc_id, event in store.by_id.items()
+        }, store.fingerprint)
+    return [store.by_id[doc_id] for doc_id, _ in index.search(query, limit) if doc_id in store.by_id]